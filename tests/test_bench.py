@@ -0,0 +1,23 @@
+import pytest
+
+from travel_bench import SPAN_YEARS, TRIP_COUNTS, bench_history, history_end, synthetic_history
+from travel_storage import CsvStore
+
+
+@pytest.mark.parametrize("span_years", SPAN_YEARS)
+@pytest.mark.parametrize("trip_count", TRIP_COUNTS)
+def test_synthetic_history_fits_span(trip_count, span_years):
+    # 標示為 span_years 年的記錄：所有行程都在年期內，而且最後的行程接近年期結束
+    approval, arrival, trips = synthetic_history(trip_count, span_years, seed=trip_count * 31 + span_years)
+    end = history_end(approval, span_years)
+    assert len(trips) == trip_count
+    assert all(arrival <= start < trip_end <= end for start, trip_end, _ in trips)
+    days = (end - arrival).days
+    assert (max(trip_end for _, trip_end, _ in trips) - arrival).days >= days * (trip_count - 1) // trip_count
+
+
+def test_bench_times_the_csv_store(tmp_path):
+    report = bench_history(10, 1, 1, str(tmp_path))
+    assert {"csv_write", "csv_read"} <= set(report["timings"])
+    data = CsvStore(str(tmp_path / "history_10_1.csv")).load()
+    assert len(data.rows) == 10
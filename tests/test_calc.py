@@ -0,0 +1,109 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+from dateutil.relativedelta import relativedelta
+
+import travel_numpy
+from travel_calc import calculate, evaluate_rules
+from travel_incremental import IncrementalAbsence
+from travel_rules import DEFAULT_RULE_SET
+
+
+def baseline(approval, arrival, trips, today):
+    # 舊版 calculate_days 的做法：把所有離境日子放進 set，每個窗口逐日篩選
+    days = set()
+    current = approval
+    while current < arrival:
+        days.add(current)
+        current += timedelta(days=1)
+    for start, end in trips:
+        current = start + timedelta(days=1)
+        while current < end:
+            days.add(current)
+            current += timedelta(days=1)
+
+    def count(start, end):
+        return len([d for d in days if start <= d <= end])
+
+    past_365_start = today - timedelta(days=365)
+    periods = []
+    max_365 = 0
+    current = approval
+    while current < approval + relativedelta(years=5):
+        end = current + timedelta(days=364)
+        days_365 = count(current, end)
+        if days_365 >= 150:
+            periods.append((days_365, current, end))
+        max_365 = max(max_365, days_365)
+        current += timedelta(days=1)
+    ilr_end = approval + relativedelta(years=6) - timedelta(days=1)
+    ilr_start = ilr_end - relativedelta(years=5) + timedelta(days=1)
+    final_year_start = ilr_end - relativedelta(years=1) + timedelta(days=1)
+    return {
+        "total_days": len(days),
+        "trip_365_counts": [count(max(approval, end - timedelta(days=364)), end) for _, end in trips],
+        "past_365_days": len([d for d in days if past_365_start <= d < today]),
+        "max_365_days": max_365,
+        "max_365_periods": sorted(periods, key=lambda p: p[0], reverse=True),
+        "ilr": (ilr_start, ilr_end, count(ilr_start, ilr_end)),
+        "final_year": (final_year_start, count(final_year_start, ilr_end)),
+    }
+
+
+def random_history(rng):
+    approval = date(2020, 1, 1) + timedelta(days=rng.randint(0, 1500))
+    arrival = approval + timedelta(days=rng.randint(0, 200))
+    trips = []
+    current = arrival
+    for _ in range(rng.randint(0, 25)):
+        start = current + timedelta(days=rng.randint(-20, 120))
+        end = start + timedelta(days=rng.randint(1, 90))
+        trips.append((start, end))
+        current = end
+    today = approval + timedelta(days=rng.randint(0, 2500))
+    return approval, arrival, trips, today
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_calculate_matches_baseline(monkeypatch, use_numpy):
+    if use_numpy and not travel_numpy.available:
+        pytest.skip("numpy 未安裝")
+    monkeypatch.setattr(travel_numpy, "available", use_numpy)
+    rng = random.Random(1)
+    for _ in range(25):
+        approval, arrival, trips, today = random_history(rng)
+        expected = baseline(approval, arrival, trips, today)
+        result = calculate(approval, arrival, trips, today)
+        assert result.total_days == expected["total_days"]
+        assert result.trip_365_counts == expected["trip_365_counts"]
+        assert result.past_365_days == expected["past_365_days"]
+        assert result.max_365_days == expected["max_365_days"]
+        assert result.max_365_periods == expected["max_365_periods"]
+        assert (result.ilr_start, result.ilr_end, result.ilr_days) == expected["ilr"]
+        assert (result.final_year_start, result.final_year_days) == expected["final_year"]
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_calculate_follows_rule_objects(monkeypatch, use_numpy):
+    # 任意365日的檢查期及上限、過去365日的窗口都來自預設規則集；改動規則後結果應與 travel_rules.evaluate 一致
+    if use_numpy and not travel_numpy.available:
+        pytest.skip("numpy 未安裝")
+    monkeypatch.setattr(travel_numpy, "available", use_numpy)
+    rule_365 = DEFAULT_RULE_SET.rule("max_365")
+    monkeypatch.setattr(rule_365, "start", relativedelta(months=6))
+    monkeypatch.setattr(rule_365, "limit", 120)
+    monkeypatch.setattr(DEFAULT_RULE_SET.rule("past_365"), "window_days", 200)
+    rng = random.Random(2)
+    for _ in range(25):
+        approval, arrival, trips, today = random_history(rng)
+        expected = evaluate_rules(approval, arrival, trips, today=today)[0]
+        result = calculate(approval, arrival, trips, today)
+        assert result.past_365_start == expected["past_365"].start
+        assert result.past_365_days == expected["past_365"].days
+        assert result.max_365_days == expected["max_365"].days
+        assert all(start >= approval + relativedelta(months=6) for _, start, _ in result.max_365_periods)
+        assert result.remains == {rule_id: rule.remain for rule_id, rule in expected.results.items()}
+        assert result.breaches == [rule_id for rule_id in expected.breaches if rule_id != "past_365"]
+        engine = IncrementalAbsence(approval, arrival, dict(enumerate(trips)))
+        assert engine.result(today).to_dict() == result.to_dict()
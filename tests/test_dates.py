@@ -0,0 +1,77 @@
+from datetime import date
+
+import pytest
+
+from travel_dates import (REASON_EMPTY, REASON_FORMAT, REASON_INVALID, DateParseError, date_error, parse_date,
+                          parse_date_strict)
+
+VALID = [
+    ("2023-01-05", date(2023, 1, 5)),      # yyyy-mm-dd 直接取值
+    ("2024-02-29", date(2024, 2, 29)),
+    (" 2023-12-31 ", date(2023, 12, 31)),  # 前後空白
+    ("2023-1-5", date(2023, 1, 5)),
+    ("2023/01/05", date(2023, 1, 5)),
+    ("2023/1/5", date(2023, 1, 5)),
+    ("2023/12/31", date(2023, 12, 31)),
+    ("20230105", date(2023, 1, 5)),
+    ("20240229", date(2024, 2, 29)),
+]
+
+INVALID = [
+    ("", REASON_EMPTY),
+    ("   ", REASON_EMPTY),
+    (None, REASON_EMPTY),
+    ("2023-02-29", REASON_INVALID),
+    ("2023/2/29", REASON_INVALID),
+    ("20230229", REASON_INVALID),
+    ("2023-13-01", REASON_INVALID),
+    ("2023-04-31", REASON_INVALID),
+    ("2023-00-10", REASON_INVALID),
+    ("2023-01-00", REASON_INVALID),
+    ("05/01/2023", REASON_FORMAT),
+    ("23-01-05", REASON_FORMAT),
+    ("2023-001-05", REASON_FORMAT),
+    ("2023.01.05", REASON_FORMAT),
+    ("2023-01/05", REASON_FORMAT),
+    ("2023-01-05x", REASON_FORMAT),
+    ("2023-0a-05", REASON_FORMAT),
+    ("2023-+1-05", REASON_FORMAT),
+    ("２０２３-01-05", REASON_FORMAT),   # 全形數字
+    ("2023010", REASON_FORMAT),
+    ("202301055", REASON_FORMAT),
+    ("5 Jan 2023", REASON_FORMAT),
+]
+
+
+@pytest.mark.parametrize("text, expected", VALID)
+def test_accepted_formats(text, expected):
+    assert parse_date(text) == expected
+    assert parse_date_strict(text) == expected
+    assert date_error(text) is None
+
+
+@pytest.mark.parametrize("text, reason", INVALID)
+def test_rejected_dates(text, reason):
+    assert parse_date(text) is None
+    error = date_error(text)
+    assert isinstance(error, DateParseError)
+    assert error.reason == reason
+    assert error.text == (text or "").strip()
+    with pytest.raises(DateParseError) as raised:
+        parse_date_strict(text)
+    assert raised.value.reason == reason
+    assert str(raised.value) == str(error)
+
+
+def test_error_is_a_value_error_and_names_the_text():
+    error = date_error("2023-02-29")
+    assert isinstance(error, ValueError)
+    assert "2023-02-29" in str(error)
+    assert str(date_error("")) == "未填寫日期"
+
+
+def test_errors_are_cached_without_changing_the_reason():
+    # 錯誤原因亦會被快取，第二次解析應得到相同結果
+    for _ in range(2):
+        assert date_error("2023-02-29").reason == REASON_INVALID
+        assert date_error("2023.02.28").reason == REASON_FORMAT
@@ -0,0 +1,90 @@
+import random
+from datetime import date, timedelta
+from itertools import accumulate
+
+from dateutil.relativedelta import relativedelta
+
+from travel_eligibility import earliest_application
+
+
+def brute_force(approval, arrival, trips, first, last):
+    # 申請日由 first 逐日移至 last，每日重新數三個限制；回傳 (第一個符合的申請日, 各限制的剩餘日數)
+    absent = set(range(approval.toordinal(), arrival.toordinal()))
+    for start, end in trips:
+        absent.update(range(start.toordinal() + 1, end.toordinal()))
+    # 逐日的累計離境日數，涵蓋所有候選日子的窗口
+    base = approval.toordinal()
+    prefix = list(accumulate((day in absent for day in range(base, last.toordinal() + 366 * 6)), initial=0))
+
+    def count(start, end):
+        # start 至 end（包括首尾兩日）的離境日數
+        return prefix[end.toordinal() + 1 - base] - prefix[max(start.toordinal() - base, 0)]
+
+    default = approval + relativedelta(years=6)
+    day = first
+    while day <= last:
+        shift = timedelta(days=(day - default).days)
+        end = day - timedelta(days=1)
+        rolling_first = (approval + shift).toordinal()
+        rolling_stop = (approval + relativedelta(years=5) + shift).toordinal()
+        totals = [prefix[start + 365 - base] - prefix[start - base] for start in range(rolling_first, rolling_stop)]
+        margins = {
+            "ilr_period": 450 - count(end - relativedelta(years=5) + timedelta(days=1), end),
+            "final_year": 90 - count(end - relativedelta(years=1) + timedelta(days=1), end),
+            "max_365": 180 - max(totals),
+        }
+        if all(remain >= 0 for remain in margins.values()):
+            return day, margins
+        day += timedelta(days=1)
+    return None, {}
+
+
+def random_history(rng):
+    # 大部分記錄超出至少一個限制，需要把申請日移後
+    approval = date(2020, 1, 1) + timedelta(days=rng.randint(0, 800))
+    arrival = approval + timedelta(days=rng.randint(0, 120))
+    trips = []
+    current = arrival
+    for _ in range(rng.randint(1, 6)):
+        start = current + timedelta(days=rng.randint(1, 500))
+        end = start + timedelta(days=rng.randint(1, 200))
+        trips.append((start, end))
+        current = end
+    return approval, arrival, trips
+
+
+def test_earliest_application_matches_brute_force():
+    rng = random.Random(17)
+    for _ in range(8):
+        approval, arrival, trips = random_history(rng)
+        result = earliest_application(approval, arrival, trips, search_years=1)
+        first = approval + relativedelta(years=6)
+        day, margins = brute_force(approval, arrival, trips, first, first + relativedelta(years=1))
+        assert result.application_date == day
+        if day is not None:
+            assert result.margins == margins
+            assert result.margin == min(margins.values())
+
+
+def test_not_before_and_breach_in_final_year():
+    # 最後一年離境 100 日：申請日須移後至該年的離境日數回落至 90 日
+    approval = arrival = date(2021, 1, 1)
+    trips = [(date(2026, 3, 1), date(2026, 6, 10))]
+    first = date(2027, 1, 1)
+    result = earliest_application(approval, arrival, trips)
+    day, margins = brute_force(approval, arrival, trips, first, first + relativedelta(years=1))
+    assert (result.application_date, result.margins) == (day, margins)
+    assert result.margins["final_year"] == 0
+
+    later = date(2027, 6, 1)
+    result = earliest_application(approval, arrival, trips, not_before=later)
+    assert (result.application_date, result.margins) == brute_force(approval, arrival, trips, later, later)
+
+
+def test_not_found_within_search_years():
+    approval = arrival = date(2021, 1, 1)
+    trips = [(date(2021, 1, 1), date(2028, 1, 1))]
+    result = earliest_application(approval, arrival, trips, search_years=1)
+    assert not result.found and result.margin is None
+    first = approval + relativedelta(years=6)
+    assert brute_force(approval, arrival, trips, first, first + relativedelta(years=1)) == (None, {})
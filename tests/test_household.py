@@ -0,0 +1,95 @@
+from datetime import date
+
+import pytest
+
+import travel_household
+from travel_calc import calculate
+from travel_household import Household
+
+TODAY = date(2025, 6, 1)
+
+
+@pytest.fixture
+def household(monkeypatch):
+    # 記錄每次重新計算的成員（以批核日分辨）
+    household = Household()
+    household.calls = []
+    names = {}
+
+    def counting_calculate(approval, arrival, trips, today=None):
+        household.calls.append(names[approval])
+        return calculate(approval, arrival, trips, today)
+
+    monkeypatch.setattr(travel_household, "calculate", counting_calculate)
+    for i, name in enumerate(["A", "B", "C"]):
+        approval = date(2021, 3, 1 + i)
+        names[approval] = name
+        household.set_member(name, approval, date(2021, 4, 1))
+    household.set_trip("a1", date(2022, 1, 1), date(2022, 2, 1), ["A"])
+    household.set_trip("b1", date(2022, 5, 1), date(2022, 6, 15), ["B"])
+    household.set_trip("shared", date(2023, 7, 1), date(2023, 8, 20), ["A", "B"])
+    household.set_trip("c1", date(2024, 1, 10), date(2024, 1, 20), ["C"])
+    household.summary(TODAY)
+    household.calls.clear()
+    return household
+
+
+def recalculated(household):
+    household.summary(TODAY)
+    calls = sorted(household.calls)
+    household.calls.clear()
+    return calls
+
+
+def assert_fresh(household):
+    # 快取的結果應與直接以該成員的行程計算相同
+    for name, member in household.members.items():
+        expected = calculate(member.approval, member.arrival, household.trips_of(name), TODAY)
+        assert household.result(name, TODAY).to_dict() == expected.to_dict()
+
+
+def test_unchanged_household_uses_cache(household):
+    assert recalculated(household) == []
+
+
+def test_editing_own_trip_invalidates_only_that_member(household):
+    assert household.set_trip("a1", date(2022, 1, 1), date(2022, 3, 1)) == {"A"}
+    assert recalculated(household) == ["A"]
+    household.set_trip("c1", date(2024, 1, 10), date(2024, 2, 20))
+    assert recalculated(household) == ["C"]
+    assert_fresh(household)
+
+
+def test_editing_shared_trip_invalidates_every_traveller(household):
+    assert household.set_trip("shared", date(2023, 7, 1), date(2023, 9, 1)) == {"A", "B"}
+    assert recalculated(household) == ["A", "B"]
+    assert_fresh(household)
+
+
+def test_same_dates_do_not_invalidate(household):
+    assert household.set_trip("shared", date(2023, 7, 1), date(2023, 8, 20)) == set()
+    household.set_member("B", date(2021, 3, 2), date(2021, 4, 1))
+    assert recalculated(household) == []
+
+
+def test_sharing_and_unsharing_touch_only_that_member(household):
+    assert household.share_trip("shared", "C") == {"C"}
+    assert recalculated(household) == ["C"]
+    assert_fresh(household)
+    household.unshare_trip("shared", "A")
+    assert recalculated(household) == ["A"]
+    assert_fresh(household)
+
+
+def test_member_dates_invalidate_only_that_member(household):
+    household.set_member("C", date(2021, 3, 3), date(2021, 5, 1))
+    assert recalculated(household) == ["C"]
+    assert_fresh(household)
+
+
+def test_incomplete_edit_drops_trip_for_all_travellers(household):
+    # 改成未完成的行程後不再計算，但所有參與者都要重新計算
+    assert household.set_trip("shared", date(2023, 7, 1), None) == {"A", "B"}
+    assert recalculated(household) == ["A", "B"]
+    assert "shared" not in household.trips
+    assert_fresh(household)
@@ -0,0 +1,49 @@
+import random
+from datetime import date, timedelta
+
+from travel_calc import calculate
+from travel_incremental import IncrementalAbsence
+
+
+def random_trip(rng, arrival):
+    # 偶然產生遠離現有時間軸的行程，令引擎需要重建
+    start = arrival + timedelta(days=rng.randint(-30, 2200) if rng.random() < 0.9 else rng.randint(3000, 4000))
+    return start, start + timedelta(days=rng.randint(1, 120))
+
+
+def test_incremental_matches_calculate():
+    # 隨機混合新增、修改及刪除行程，每一步都與以 calculate() 重新計算的結果相同，
+    # 而且 365 日數目有改變的行都在 set_trip／remove_trip 回傳的集合內
+    rng = random.Random(6)
+    for _ in range(15):
+        approval = date(2020, 1, 1) + timedelta(days=rng.randint(0, 1500))
+        arrival = approval + timedelta(days=rng.randint(0, 200))
+        today = approval + timedelta(days=rng.randint(0, 2500))
+        trips = {key: random_trip(rng, arrival) for key in range(rng.randint(0, 8))}
+        engine = IncrementalAbsence(approval, arrival, trips)
+        counts = {key: engine.trip_365_count(key) for key in engine.trips}
+        next_key = len(trips)
+
+        for _ in range(30):
+            action = rng.random()
+            if action < 0.3 or not engine.trips:
+                key, next_key = next_key, next_key + 1
+                affected = engine.set_trip(key, *random_trip(rng, arrival))
+            elif action < 0.7:
+                key = rng.choice(list(engine.trips))
+                start, end = engine.trips[key]
+                if rng.random() < 0.5:
+                    start, end = random_trip(rng, arrival)
+                else:
+                    end = max(end + timedelta(days=rng.randint(-10, 10)), start + timedelta(days=1))
+                affected = engine.set_trip(key, start, end)
+            else:
+                key = rng.choice(list(engine.trips))
+                affected = engine.remove_trip(key)
+
+            expected = calculate(approval, arrival, list(engine.trips.values()), today)
+            assert engine.result(today).to_dict() == expected.to_dict()
+            new_counts = dict(zip(engine.trips, expected.trip_365_counts))
+            changed = {key for key, count in new_counts.items() if counts.get(key) != count}
+            assert changed <= affected
+            counts = new_counts
@@ -0,0 +1,27 @@
+from datetime import date
+
+from travel_normalize import (ISSUE_DUPLICATE, ISSUE_FORMAT, ISSUE_INVERTED, ISSUE_MISSING, ISSUE_OVERLAP,
+                              normalize_trips)
+
+
+def test_reports_every_problem_with_row_references():
+    report = normalize_trips([
+        ("a", "2022-01-01", "2022-01-10"),
+        ("b", "2022-01-05", "2022-01-20"),
+        ("c", "", ""),
+        ("d", "2022-01-01", "2022-01-10"),
+        ("e", "2022-02-01", ""),
+        ("f", "2022-03-10", "2022-03-01"),
+        ("g", "2022-13-01", "2022-03-01"),
+        ("h", "2022-01-20", "2022-01-25"),
+    ])
+    assert [(issue.kind, issue.ref, issue.line, issue.other) for issue in report.issues] == [
+        (ISSUE_OVERLAP, "b", 2, "a"),
+        (ISSUE_DUPLICATE, "d", 4, "a"),
+        (ISSUE_MISSING, "e", 5, None),
+        (ISSUE_INVERTED, "f", 6, None),
+        (ISSUE_FORMAT, "g", 7, None),
+    ]
+    assert set(report.trips) == {"a", "b", "d", "h"}
+    # 同日回國再出國（b 與 h）不合併
+    assert report.merged == [(date(2022, 1, 1), date(2022, 1, 20)), (date(2022, 1, 20), date(2022, 1, 25))]
@@ -0,0 +1,84 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from travel_calc import RULE_365, RULE_FINAL_YEAR, RULE_ILR_PERIOD, rule_periods
+from travel_planner import TripPlanner
+
+
+def oracle(approval, arrival, trips, departure):
+    # 由出國日翌日起逐日延長行程，每加一日就重新檢查包含該日的每個窗口；
+    # 回傳 (最遲回國日或 None, 可離境日數, 該日超額的規則 id)
+    check_start, check_end, ilr_start, ilr_end, final_year_start = rule_periods(approval)
+    absent = set(range(approval.toordinal(), arrival.toordinal()))
+    for start, end in trips:
+        absent.update(range(start.toordinal() + 1, end.toordinal()))
+
+    window = RULE_365.window_days
+    windows = [(RULE_365.id, lo, lo + window - 1, RULE_365.limit)
+               for lo in range(check_start.toordinal(), check_end.toordinal())]
+    windows.append((RULE_ILR_PERIOD.id, ilr_start.toordinal(), ilr_end.toordinal(), RULE_ILR_PERIOD.limit))
+    windows.append((RULE_FINAL_YEAR.id, final_year_start.toordinal(), ilr_end.toordinal(), RULE_FINAL_YEAR.limit))
+    counts = [sum(1 for day in range(lo, hi + 1) if day in absent) for _, lo, hi, _ in windows]
+
+    new_days = 0
+    for day in range(departure.toordinal() + 1, max(hi for _, _, hi, _ in windows) + 2):
+        containing = [i for i, (_, lo, hi, _) in enumerate(windows) if lo <= day <= hi]
+        if day not in absent:
+            for i in containing:
+                counts[i] += 1
+        over = {windows[i][0] for i in containing if counts[i] > windows[i][3]}
+        if over:
+            return date.fromordinal(day), new_days, over
+        new_days += day not in absent
+    return None, 0, set()
+
+
+def check(approval, arrival, trips, departure):
+    plan = TripPlanner(approval, arrival, trips).latest_return(departure)
+    latest, absent_days, over = oracle(approval, arrival, trips, departure)
+    assert plan.latest_return == latest
+    if latest is not None:
+        assert plan.absent_days == absent_days
+        assert plan.binding_rule in over
+    return plan
+
+
+def test_latest_return_matches_day_by_day_oracle():
+    rng = random.Random(7)
+    for _ in range(12):
+        approval = date(2020, 1, 1) + timedelta(days=rng.randint(0, 1000))
+        arrival = approval + timedelta(days=rng.randint(0, 120))
+        trips = []
+        current = arrival
+        for _ in range(rng.randint(0, 12)):
+            start = current + timedelta(days=rng.randint(1, 150))
+            end = start + timedelta(days=rng.randint(1, 60))
+            trips.append((start, end))
+            current = end
+        departures = [arrival + timedelta(days=rng.randint(0, 2000)) for _ in range(2)]
+        if trips:
+            # 出國日在現有行程之內
+            start, end = rng.choice(trips)
+            departures.append(start + timedelta(days=(end - start).days // 2))
+        for departure in departures:
+            check(approval, arrival, trips, departure)
+
+
+def test_departure_inside_existing_trip():
+    # 現有行程的日子已計算在內，延長時不會再佔用可離境日數
+    approval = arrival = date(2021, 1, 1)
+    trips = [(date(2021, 3, 1), date(2021, 5, 1))]
+    plan = check(approval, arrival, trips, date(2021, 4, 1))
+    assert plan.latest_return > date(2021, 5, 1)
+
+
+@pytest.mark.parametrize("departure", [date(2021, 8, 1), date(2021, 9, 1)])
+def test_limit_hit_on_first_day(departure):
+    # 2月2日至7月31日已離境 180 日：之後一年內出國，第一個離境日子已超出任意365日的上限
+    approval = arrival = date(2021, 1, 1)
+    trips = [(date(2021, 2, 1), date(2021, 8, 1))]
+    plan = check(approval, arrival, trips, departure)
+    assert plan.latest_return == departure + timedelta(days=1)
+    assert (plan.absent_days, plan.binding_rule) == (0, RULE_365.id)
@@ -0,0 +1,19 @@
+import pstats
+from concurrent.futures import ThreadPoolExecutor
+
+import travel_profile
+
+
+def worker_job():
+    return sum(range(1000))
+
+
+def test_cprofile_session_includes_worker_jobs(tmp_path, monkeypatch):
+    # 計算、讀取及儲存都在背景執行緒執行，cProfile 結果必須包括這些工作
+    path = str(tmp_path / "bno.prof")
+    monkeypatch.setattr(travel_profile, "MODE", "cprofile")
+    monkeypatch.setattr(travel_profile, "PROFILE_PATH", path)
+    with travel_profile.session():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(travel_profile.profiled(worker_job)).result() == 499500
+    assert "worker_job" in {name for _, _, name in pstats.Stats(path).stats}
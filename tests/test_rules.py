@@ -0,0 +1,28 @@
+import pytest
+
+from travel_rules import DEFAULT_RULE_SET, RuleSetError, compile_rule_set
+
+
+def old_level(remain, thresholds):
+    # 舊版 color_label 的判斷：超額或 <= 最嚴級別為紅色(3)，之後為橙(2)、黃(1)、正常(0)
+    if remain < 0 or remain <= thresholds[2]:
+        return 3
+    if remain <= thresholds[1]:
+        return 2
+    if remain <= thresholds[0]:
+        return 1
+    return 0
+
+
+@pytest.mark.parametrize("rule_id", ["past_365", "max_365", "ilr_period", "final_year"])
+def test_level_matches_colour_bands(rule_id):
+    rule = DEFAULT_RULE_SET.rule(rule_id)
+    for remain in range(-5, rule.limit + 1):
+        assert rule.level(remain) == old_level(remain, rule.warn), remain
+
+
+def test_rolling_window_must_be_days():
+    spec = {"name": "x", "application": {"years": 6}, "rules": [
+        {"id": "r", "anchor": "rolling", "window": {"years": 1}, "until": {"years": 5}, "limit": 1}]}
+    with pytest.raises(RuleSetError):
+        compile_rule_set(spec)
@@ -0,0 +1,75 @@
+import random
+from datetime import timedelta
+
+import pytest
+
+import travel_numpy
+from test_calc import random_history
+from travel_calc import calculate, rule_periods
+from travel_engine import AbsenceIndex, stay_intervals
+from travel_scenarios import Scenario, ScenarioBatch
+
+
+def random_scenario(rng, trips, approval, index):
+    keys = list(trips)
+    remove = rng.sample(keys, rng.randint(0, min(2, len(keys))))
+    shift = {key: rng.randint(-60, 60) for key in rng.sample(keys, rng.randint(0, min(3, len(keys))))}
+    add = []
+    for _ in range(rng.randint(0, 3)):
+        start = approval + timedelta(days=rng.randint(0, 2200))
+        add.append((start, start + timedelta(days=rng.randint(1, 120))))
+    return Scenario(f"scenario {index}", add, remove, shift)
+
+
+def edited_trips(trips, scenario):
+    # 逐個行程套用改動後的完整記錄
+    edited = []
+    for key, (start, end) in trips.items():
+        if key in scenario.remove:
+            continue
+        days = timedelta(days=scenario.shift.get(key, 0))
+        edited.append((start + days, end + days))
+    return edited + list(scenario.add)
+
+
+def calc_windows(result):
+    # calculate() 的固定窗口，以規則 id 為 key
+    _, _, ilr_start, ilr_end, final_year_start = rule_periods(result.approval)
+    return {
+        "past_365": (result.past_365_start, result.today - timedelta(days=1)),
+        "ilr_period": (ilr_start, ilr_end),
+        "final_year": (final_year_start, ilr_end),
+    }
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_scenarios_match_calculate_on_edited_history(monkeypatch, use_numpy):
+    # 每個情境的結果應與以改動後記錄重新執行 calculate() 的結果相同
+    if use_numpy and not travel_numpy.available:
+        pytest.skip("numpy 未安裝")
+    monkeypatch.setattr(travel_numpy, "available", use_numpy)
+    rng = random.Random(20)
+    for _ in range(15):
+        approval, arrival, trip_list, today = random_history(rng)
+        trips = dict(enumerate(trip_list))
+        scenarios = [Scenario("baseline")] + [random_scenario(rng, trips, approval, i) for i in range(6)]
+        batch = ScenarioBatch(approval, arrival, trips, today=today)
+        for scenario, result in zip(scenarios, batch.evaluate(scenarios)):
+            edited = edited_trips(trips, scenario)
+            expected = calculate(approval, arrival, edited, today)
+            assert {rule_id: rule.remain for rule_id, rule in result.rules.results.items()} == expected.remains
+            assert result.rules.results["max_365"].days == expected.max_365_days
+            assert result.breaches == [rule_id for rule_id, remain in expected.remains.items() if remain < 0]
+
+            # 最差的窗口：剩餘日數最少，且窗口內的離境日數與改動後的記錄相符
+            worst = result.worst
+            assert worst.remain == min(expected.remains.values())
+            windows = calc_windows(expected)
+            if worst.rule.id in windows:
+                assert (worst.start, worst.end) == windows[worst.rule.id]
+            elif worst.start is not None:
+                check_start, check_end = rule_periods(approval)[:2]
+                assert check_start <= worst.start < check_end
+                assert (worst.end - worst.start).days + 1 == worst.rule.window_days
+                index = AbsenceIndex(stay_intervals(approval, arrival, edited))
+                assert index.count(worst.start, worst.end) == worst.days
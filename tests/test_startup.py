@@ -0,0 +1,17 @@
+import pytest
+
+from travel_bench import STARTUP_TARGETS, bench_startup, time_import
+
+
+def test_startup_within_targets():
+    # 與 python -m travel_bench --startup 相同：import 視窗程式及第一次載入 1,000 次行程都不可超出目標
+    # 視窗程式需要 tkinter；沒有 tkinter 的環境（例如部分 CI）略過
+    pytest.importorskip("tkinter")
+    report = bench_startup(repeat=5)
+    assert set(report["targets"]) == set(STARTUP_TARGETS)
+    assert report["over_target"] == [], report["timings"]
+
+
+def test_failed_import_is_an_error():
+    with pytest.raises(RuntimeError):
+        time_import("no_such_module_for_bench", 1)
@@ -0,0 +1,36 @@
+from travel_storage import SqliteStore, StoredData
+
+
+def keys(store):
+    return [row[0] for row in store.load().rows]
+
+
+def test_order_survives_delete_and_reload(tmp_path):
+    # 介面：A0、B1、C2 → 刪除 A → 新增 D3 → 修改 C；重新載入應與介面相同（B、C、D）
+    store = SqliteStore(str(tmp_path / "t.db"))
+    store.save(StoredData("2021-03-01", "2021-06-01", "", [
+        ("a", "2021-07-01", "2021-07-10", ""),
+        ("b", "2021-08-01", "2021-08-10", ""),
+        ("c", "2021-09-01", "2021-09-10", ""),
+    ]))
+    store.delete_rows(["a"])
+    store.upsert_row("d", 3, "2021-10-01", "2021-10-10", "")
+    store.upsert_row("c", 2, "2021-09-02", "2021-09-10", "")
+    assert keys(store) == ["b", "c", "d"]
+    assert store.load().positions == [1, 2, 3]
+    store.close()
+
+
+def test_save_keeps_positions_of_blank_rows(tmp_path):
+    # 介面：A0、X1（空白行，儲存時略過）、C2 → 儲存 → 填寫 X；重新載入仍是 A、X、C
+    store = SqliteStore(str(tmp_path / "t.db"))
+    store.save(StoredData("2021-03-01", "2021-06-01", "", [
+        ("a", "2021-07-01", "2021-07-10", ""),
+        ("c", "2021-09-01", "2021-09-10", ""),
+    ], [0, 2]))
+    store.upsert_row("x", 1, "2021-08-01", "2021-08-10", "")
+    assert keys(store) == ["a", "x", "c"]
+    store.delete_rows(["a"])
+    store.upsert_row("x", 1, "2021-08-02", "2021-08-10", "")
+    assert keys(store) == ["x", "c"]
+    store.close()
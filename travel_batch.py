@@ -0,0 +1,97 @@
+import argparse
+import csv
+import glob
+import os
+import sys
+from functools import partial
+from multiprocessing import Pool
+
+from travel_calc import TravelDataError, calculate_record, parse_date, read_record
+
+SUMMARY_FIELDS = [
+    "file", "approval", "arrival", "total_days", "max_365_days",
+    "ilr_start", "ilr_end", "ilr_days", "final_year_days", "breaches", "error",
+]
+
+
+def iter_paths(target, pattern="*.csv"):
+    # target 可以是資料夾（讀取當中所有 csv）或 glob 樣式
+    if os.path.isdir(target):
+        target = os.path.join(target, pattern)
+    return (p for p in glob.iglob(target, recursive=True) if os.path.isfile(p))
+
+
+def summarise(path, today=None):
+    row = dict.fromkeys(SUMMARY_FIELDS, "")
+    row["file"] = path
+    try:
+        result = calculate_record(read_record(path), today)
+    except (OSError, TravelDataError) as e:
+        row["error"] = str(e)
+        return row
+
+    row.update(
+        approval=result.approval.isoformat(),
+        arrival=result.arrival.isoformat(),
+        total_days=result.total_days,
+        max_365_days=result.max_365_days,
+        ilr_start=result.ilr_start.isoformat(),
+        ilr_end=result.ilr_end.isoformat(),
+        ilr_days=result.ilr_days,
+        final_year_days=result.final_year_days,
+        breaches=";".join(result.breaches),
+    )
+    return row
+
+
+def run_batch(paths, out, workers=None, today=None, chunksize=16):
+    # 逐個檔案串流計算並即時寫出摘要，回傳已處理的檔案數目
+    writer = csv.DictWriter(out, fieldnames=SUMMARY_FIELDS)
+    writer.writeheader()
+    job = partial(summarise, today=today)
+
+    count = 0
+    if workers == 1:
+        for row in map(job, paths):
+            writer.writerow(row)
+            count += 1
+        return count
+
+    with Pool(processes=workers) as pool:
+        for row in pool.imap(job, paths, chunksize=chunksize):
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m travel_batch", description="批量計算多個 bno_travel_data.csv 檔案")
+    parser.add_argument("target", help="資料夾或 glob 樣式，例如 data/ 或 'clients/**/*.csv'")
+    parser.add_argument("-o", "--output", help="摘要輸出檔案（預設輸出至 stdout）")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="工作程序數目（預設為 CPU 數目）")
+    parser.add_argument("--chunksize", type=int, default=16, help="每次分派給工作程序的檔案數目")
+    parser.add_argument("--today", help="以指定日期 (yyyy-mm-dd) 代替今日")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    today = None
+    if args.today:
+        today = parse_date(args.today)
+        if not today:
+            print(f"日期格式錯誤：{args.today}", file=sys.stderr)
+            return 2
+
+    paths = iter_paths(args.target)
+    if args.output:
+        with open(args.output, "w", newline='', encoding="utf-8") as f:
+            count = run_batch(paths, f, args.workers, today, args.chunksize)
+    else:
+        count = run_batch(paths, sys.stdout, args.workers, today, args.chunksize)
+    print(f"已處理 {count} 個檔案", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import travel_numpy
+from travel_calc import calculate, parse_date, past_365_window, rule_periods, window_365_start
+from travel_engine import AbsenceIndex, stay_intervals
+from travel_incremental import IncrementalAbsence
+from travel_storage import CsvStore, StoredData, new_row_key
+
+TRIP_COUNTS = (10, 100, 1000, 10000)
+SPAN_YEARS = (1, 5, 10, 20)
+QUICK_TRIP_COUNTS = (10, 100, 1000)
+QUICK_SPAN_YEARS = (1, 5)
+
+# 原版（單一檔案）視窗程式 import 的模組；import_app 的目標以在同一部機器 import 這些模組的時間為基準
+BASELINE_IMPORTS = "tkinter, tkinter.messagebox, csv, datetime, os, webbrowser, dateutil.relativedelta"
+# 啟動時間目標：import_app 為 BASELINE_IMPORTS 時間的倍數（規則、行程檢查及儲存模組需要 dataclasses，約多三成）；
+# first_load 為首次繪畫後載入及計算一份 STARTUP_TRIPS 次行程記錄的秒數
+STARTUP_TRIPS = 1000
+STARTUP_TARGETS = {"import_app": 1.75, "first_load": 0.1}
+
+
+def history_end(approval, span_years):
+    # synthetic_history 的行程不會遲於此日
+    return approval + timedelta(days=span_years * 365)
+
+
+def synthetic_history(trip_count, span_years, seed=0):
+    # 產生虛構出入境記錄，所有行程都在到達日至 history_end 之內：
+    # 到達日後的日子平均分成 trip_count 段，大部分行程在各自的一段內隨機出發，
+    # 另有約一成首尾相連及一成互相重疊的行程（行程多於日數時，同一日會有多次行程）
+    rng = random.Random(seed)
+    approval = date(2021, 1, 1)
+    arrival = approval + timedelta(days=rng.randint(0, 60))
+    last = history_end(approval, span_years)
+    slot = (last - arrival).days / max(trip_count, 1)
+    # 每段少於幾日時，行程仍有數日長（與相鄰行程重疊），使記錄有離境日子
+    length = max(3, int(slot))
+
+    trips = []
+    for i in range(trip_count):
+        kind = rng.random()
+        if trips and kind < 0.1:
+            start = trips[-1][1]
+        elif trips and kind < 0.2:
+            last_start, last_end, _ = trips[-1]
+            start = last_end - timedelta(days=rng.randint(1, max(1, (last_end - last_start).days)))
+        else:
+            start = arrival + timedelta(days=int(i * slot) + rng.randint(0, max(0, int(slot) - 1)))
+        start = min(start, last - timedelta(days=1))
+        end = min(start + timedelta(days=rng.randint(1, length)), last)
+        trips.append((start, end, f"trip {i}"))
+    return approval, arrival, trips
+
+
+def time_call(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return {"min": min(samples), "median": statistics.median(samples)}
+
+
+def stored_history(approval, arrival, trips):
+    # 與 TravelApp.save_data 交給儲存方式的資料相同
+    rows = [(new_row_key(), start.isoformat(), end.isoformat(), activity) for start, end, activity in trips]
+    return StoredData(approval.isoformat(), arrival.isoformat(), datetime.now().strftime("%Y-%m-%d %H:%M"), rows)
+
+
+def bench_history(trip_count, span_years, repeat, workdir):
+    approval, arrival, trips = synthetic_history(trip_count, span_years, seed=trip_count * 31 + span_years)
+    # 標示為 span_years 年的記錄必須真的在這段時間內，否則各項時間與年期無關
+    assert all(arrival <= start < end <= history_end(approval, span_years) for start, end, _ in trips)
+    texts = [d.isoformat() for start, end, _ in trips for d in (start, end)]
+    today = approval + timedelta(days=span_years * 365)
+    check_start, check_end, ilr_start, ilr_end, final_year_start = rule_periods(approval)
+    index = AbsenceIndex(stay_intervals(approval, arrival, trips))
+    store = CsvStore(os.path.join(workdir, f"history_{trip_count}_{span_years}.csv"))
+    data = stored_history(approval, arrival, trips)
+
+    def rolling_python():
+        max(count for _, _, count in index.rolling_counts(check_start, check_end))
+
+    def incremental_edit():
+        start, end, _ = trips[len(trips) // 2]
+        engine.set_trip(len(trips) // 2, start, end + timedelta(days=7))
+        engine.set_trip(len(trips) // 2, start, end)
+
+    engine = IncrementalAbsence(approval, arrival, {i: (s, e) for i, (s, e, _) in enumerate(trips)})
+
+    timings = {
+        "parse_date": time_call(lambda: [parse_date(t) for t in texts], repeat),
+        "build_index": time_call(lambda: AbsenceIndex(stay_intervals(approval, arrival, trips)), repeat),
+        "total_days": time_call(lambda: len(index), repeat),
+        "trip_365": time_call(lambda: [index.count(window_365_start(approval, e), e) for _, e, _ in trips], repeat),
+        "past_365": time_call(lambda: index.count(*past_365_window(today)), repeat),
+        "rolling_365_python": time_call(rolling_python, repeat),
+        "ilr_period": time_call(lambda: index.count(ilr_start, ilr_end), repeat),
+        "final_year": time_call(lambda: index.count(final_year_start, ilr_end), repeat),
+        "calculate": time_call(lambda: calculate(approval, arrival, trips, today), repeat),
+        "incremental_build": time_call(
+            lambda: IncrementalAbsence(approval, arrival, {i: (s, e) for i, (s, e, _) in enumerate(trips)}), repeat),
+        "incremental_edit": time_call(incremental_edit, repeat),
+        "csv_write": time_call(lambda: store.save(data), repeat),
+        "csv_read": time_call(store.load, repeat),
+    }
+    if travel_numpy.available:
+        timings["rolling_365_numpy"] = time_call(
+            lambda: travel_numpy.rolling_timeline(index, approval, check_end).peak(), repeat)
+    return {"trips": trip_count, "span_years": span_years, "timings": timings}
+
+
+def time_imports(modules, repeat):
+    # 每次以新的 Python 程序 import，量度冷啟動時間（tkinter 只 import，不開視窗，可在無顯示器環境執行）
+    # 每個項目可以是以逗號分隔的多個模組；各項目輪流量度，機器負載的變化對每個項目的影響相若
+    # 第一輪只用作寫入 .pyc，不計時，與安裝後的情況相同（否則修改過的原始碼每次都要重新編譯）
+    # import 失敗（例如沒有 tkinter）時拋出 RuntimeError，不可當作通過
+    env = {key: value for key, value in os.environ.items() if key != "PYTHONDONTWRITEBYTECODE"}
+    samples = {module: [] for module in modules}
+    for _ in range(repeat + 1):
+        for module in modules:
+            code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+            output = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                    capture_output=True, text=True, env=env)
+            if output.returncode != 0:
+                lines = output.stderr.strip().splitlines()
+                raise RuntimeError(f"import {module} 失敗：{lines[-1] if lines else output.returncode}")
+            samples[module].append(float(output.stdout))
+    return {module: {"min": min(values[1:]), "median": statistics.median(values[1:])}
+            for module, values in samples.items()}
+
+
+def time_import(module, repeat):
+    return time_imports([module], repeat)[module]
+
+
+def bench_startup(repeat):
+    # 與 TravelApp 啟動後的步驟相同：讀取檔案，建立計算引擎並計算結果
+    approval, arrival, trips = synthetic_history(STARTUP_TRIPS, 10, seed=STARTUP_TRIPS)
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "bno_travel_data.csv")
+        CsvStore(path).save(stored_history(approval, arrival, trips))
+
+        def first_load():
+            data = CsvStore(path).load()
+            rows = {key: (parse_date(out_date), parse_date(in_date)) for key, out_date, in_date, _ in data.rows}
+            engine = IncrementalAbsence(parse_date(data.approval), parse_date(data.arrival), rows)
+            engine.result(include_trips=False)
+            [engine.trip_365_count(key) for key in rows]
+
+        imports = time_imports([BASELINE_IMPORTS, "travel_days_app"], repeat)
+        timings = {
+            "baseline_import": imports[BASELINE_IMPORTS],
+            "import_app": imports["travel_days_app"],
+            "first_load": time_call(first_load, repeat),
+        }
+    # 各項目的上限（秒）
+    targets = {"import_app": timings["baseline_import"]["min"] * STARTUP_TARGETS["import_app"],
+               "first_load": STARTUP_TARGETS["first_load"]}
+    over = [name for name, target in targets.items() if timings[name]["min"] > target]
+    return {"trips": STARTUP_TRIPS, "targets": targets, "timings": timings, "over_target": over}
+
+
+def run(trip_counts, span_years, repeat):
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for trip_count in trip_counts:
+            for years in span_years:
+                results.append(bench_history(trip_count, years, repeat, workdir))
+    return {
+        "generated": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": travel_numpy.available,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance):
+    # 回傳比基準慢超過 tolerance 倍的項目
+    previous = {(r["trips"], r["span_years"]): r["timings"] for r in baseline["results"]}
+    slower = []
+    for result in report["results"]:
+        old = previous.get((result["trips"], result["span_years"]), {})
+        for name, timing in result["timings"].items():
+            if name in old and old[name]["median"] > 0 and timing["median"] > old[name]["median"] * tolerance:
+                slower.append((result["trips"], result["span_years"], name,
+                               old[name]["median"], timing["median"]))
+    return slower
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m travel_bench", description="離境日數計算及 CSV 讀寫的效能測試（無需視窗）")
+    parser.add_argument("-o", "--output", help="把結果寫入 JSON 檔案（預設輸出至 stdout）")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="每項重複次數")
+    parser.add_argument("--quick", action="store_true", help="只測試較小的記錄")
+    parser.add_argument("--compare", help="與之前的 JSON 結果比較")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="比基準慢多少倍視為退步")
+    parser.add_argument("--startup", action="store_true", help="只量度視窗程式的啟動時間，超出目標或無法 import 時回傳 1")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.startup:
+        try:
+            report = bench_startup(args.repeat)
+        except RuntimeError as e:
+            print(e, file=sys.stderr)
+            return 1
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        for name in report["over_target"]:
+            print(f"{name}：{report['timings'][name]['min'] * 1000:.1f} ms，目標 {report['targets'][name] * 1000:.0f} ms",
+                  file=sys.stderr)
+        return 1 if report["over_target"] else 0
+
+    if args.quick:
+        report = run(QUICK_TRIP_COUNTS, QUICK_SPAN_YEARS, args.repeat)
+    else:
+        report = run(TRIP_COUNTS, SPAN_YEARS, args.repeat)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            slower = compare(report, json.load(f), args.tolerance)
+        for trips, years, name, old, new in slower:
+            print(f"{trips} 次行程 / {years} 年 {name}：{old * 1000:.3f} ms → {new * 1000:.3f} ms", file=sys.stderr)
+        if slower:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
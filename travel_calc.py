@@ -0,0 +1,323 @@
+import argparse
+import csv
+import json
+import sys
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+import travel_numpy
+import travel_rules
+from travel_dates import date_error, parse_date
+from travel_engine import AbsenceIndex, stay_intervals
+from travel_normalize import normalize_trips
+from travel_rules import ANCHOR_TODAY, DEFAULT_RULE_SET, RULE_SETS, RuleSetError, load_rule_sets
+
+# 以下數值均來自預設規則集（travel_rules.BNO）
+RULE_PAST_365 = DEFAULT_RULE_SET.rule("past_365")
+RULE_365 = DEFAULT_RULE_SET.rule("max_365")
+RULE_ILR_PERIOD = DEFAULT_RULE_SET.rule("ilr_period")
+RULE_FINAL_YEAR = DEFAULT_RULE_SET.rule("final_year")
+
+LIMIT_365 = RULE_365.limit
+LIMIT_ILR_PERIOD = RULE_ILR_PERIOD.limit
+LIMIT_FINAL_YEAR = RULE_FINAL_YEAR.limit
+WARNING_365 = RULE_365.report
+WINDOW_365 = RULE_365.window_days
+
+
+class TravelDataError(ValueError):
+    pass
+
+
+@dataclass
+class TravelRecord:
+    approval: date
+    arrival: date
+    trips: list = field(default_factory=list)
+    saved_at: str = ""
+    source: str = ""
+    issues: list = field(default_factory=list)
+
+
+@dataclass
+class CalculationResult:
+    approval: date
+    arrival: date
+    today: date
+    total_days: int
+    trip_365_counts: list
+    past_365_start: date
+    past_365_days: int
+    max_365_days: int
+    max_365_periods: list
+    ilr_start: date
+    ilr_end: date
+    ilr_days: int
+    final_year_start: date
+    final_year_end: date
+    final_year_days: int
+
+    @property
+    def past_365_remain(self):
+        return RULE_PAST_365.limit - self.past_365_days
+
+    @property
+    def max_365_remain(self):
+        return RULE_365.limit - self.max_365_days
+
+    @property
+    def ilr_remain(self):
+        return RULE_ILR_PERIOD.limit - self.ilr_days
+
+    @property
+    def final_year_remain(self):
+        return RULE_FINAL_YEAR.limit - self.final_year_days
+
+    @property
+    def remains(self):
+        # 以規則 id 為 key 的剩餘日數
+        return {
+            RULE_PAST_365.id: self.past_365_remain,
+            RULE_365.id: self.max_365_remain,
+            RULE_ILR_PERIOD.id: self.ilr_remain,
+            RULE_FINAL_YEAR.id: self.final_year_remain,
+        }
+
+    @property
+    def breaches(self):
+        # 按規則集的次序列出超額的規則；過去365日只反映今日的狀況，不計作超額
+        remains = self.remains
+        return [rule.id for rule in DEFAULT_RULE_SET.rules if rule.anchor != ANCHOR_TODAY and remains[rule.id] < 0]
+
+    def to_dict(self):
+        return {
+            "approval": self.approval.isoformat(),
+            "arrival": self.arrival.isoformat(),
+            "today": self.today.isoformat(),
+            "total_days": self.total_days,
+            "trip_365_counts": self.trip_365_counts,
+            "past_365": {"start": self.past_365_start.isoformat(), "end": self.today.isoformat(),
+                         "days": self.past_365_days, "remain": self.past_365_remain},
+            "max_365": {"days": self.max_365_days, "remain": self.max_365_remain,
+                        "periods": [{"start": s.isoformat(), "end": e.isoformat(), "days": c}
+                                    for c, s, e in self.max_365_periods]},
+            "ilr_period": {"start": self.ilr_start.isoformat(), "end": self.ilr_end.isoformat(),
+                           "days": self.ilr_days, "remain": self.ilr_remain},
+            "final_year": {"start": self.final_year_start.isoformat(), "end": self.final_year_end.isoformat(),
+                           "days": self.final_year_days, "remain": self.final_year_remain},
+            "breaches": self.breaches,
+        }
+
+
+def validate_trips(approval, arrival, trips):
+    if arrival < approval:
+        raise TravelDataError("到達日必須晚於或等於批核日。")
+    for start, end, *_ in trips:
+        if end <= start:
+            raise TravelDataError("回國日必須晚於出國日。")
+
+
+def rule_periods(approval):
+    # 回傳 (任意365日檢查期開始日, 檢查期結束日（不包括）, 入籍計算期開始日, 入籍計算期結束日, 最後一年開始日)
+    start_of_check_period = approval + RULE_365.start
+    end_of_check_period = approval + RULE_365.until
+    naturalisation_application_date = DEFAULT_RULE_SET.application_date(approval)
+    ilr_end = naturalisation_application_date - timedelta(days=1)
+    ilr_start = RULE_ILR_PERIOD.window_start(ilr_end)
+    final_year_start = RULE_FINAL_YEAR.window_start(ilr_end)
+    return start_of_check_period, end_of_check_period, ilr_start, ilr_end, final_year_start
+
+
+def past_365_window(today):
+    # 過去365日的 (開始日, 結束日)：以今日前一日為結束日
+    end = today - timedelta(days=1)
+    return RULE_PAST_365.window_start(end), end
+
+
+def window_365_start(approval, end):
+    # 以回國日為結束日的365日窗口開始日（不早於批核日）
+    return max(approval, RULE_365.window_start(end))
+
+
+def calculate(approval, arrival, trips, today=None):
+    # trips 為 (出國日, 回國日[, 活動]) 的列表
+    validate_trips(approval, arrival, trips)
+    today = today or date.today()
+
+    absence_index = AbsenceIndex(stay_intervals(approval, arrival, trips))
+
+    trip_365_counts = []
+    for _, end, *_ in trips:
+        trip_365_counts.append(absence_index.count(window_365_start(approval, end), end))
+
+    past_365_start, past_365_end = past_365_window(today)
+    past_365_days = absence_index.count(past_365_start, past_365_end)
+
+    start_of_check_period, end_of_check_period, ilr_start, ilr_end, final_year_start = rule_periods(approval)
+    if travel_numpy.available:
+        timeline = travel_numpy.rolling_timeline(absence_index, start_of_check_period, end_of_check_period, WINDOW_365)
+        max_365_days = timeline.peak()[0]
+        max_365_periods = timeline.windows_at_least(WARNING_365)
+    else:
+        max_365_periods = []
+        max_365_days = 0
+        for start_window, end_window, count in absence_index.rolling_counts(start_of_check_period, end_of_check_period,
+                                                                           WINDOW_365):
+            if count >= WARNING_365:
+                max_365_periods.append((count, start_window, end_window))
+            if count > max_365_days:
+                max_365_days = count
+    max_365_periods.sort(key=lambda x: x[0], reverse=True)
+
+    return CalculationResult(
+        approval=approval,
+        arrival=arrival,
+        today=today,
+        total_days=len(absence_index),
+        trip_365_counts=trip_365_counts,
+        past_365_start=past_365_start,
+        past_365_days=past_365_days,
+        max_365_days=max_365_days,
+        max_365_periods=max_365_periods,
+        ilr_start=ilr_start,
+        ilr_end=ilr_end,
+        ilr_days=absence_index.count(ilr_start, ilr_end),
+        final_year_start=final_year_start,
+        final_year_end=ilr_end,
+        final_year_days=absence_index.count(final_year_start, ilr_end),
+    )
+
+
+def evaluate_rules(approval, arrival, trips, rule_sets=None, today=None):
+    # 以同一個 AbsenceIndex 一次過計算多個規則集，回傳 RuleSetResult 列表
+    validate_trips(approval, arrival, trips)
+    index = AbsenceIndex(stay_intervals(approval, arrival, trips))
+    return travel_rules.evaluate(index, approval, rule_sets or [DEFAULT_RULE_SET], today or date.today())
+
+
+def format_rule_results(results):
+    lines = []
+    for result in results:
+        lines.append(f"== {result.rule_set.label}（申請日 {result.application_date}）==")
+        for rule_id, rule_result in result.results.items():
+            rule = rule_result.rule
+            period = f"（{rule_result.start}–{rule_result.end}）" if rule_result.start else ""
+            lines.append(f"{rule.label}{period}：{rule_result.days}日 / {rule.limit}日（剩餘 {rule_result.remain} 日）")
+    return "\n".join(lines)
+
+
+def read_record(path):
+    # 讀取 bno_travel_data.csv 格式：第一行為批核日、到達日、儲存日期，之後每行為出國日、回國日、活動
+    with open(path, newline='', encoding="utf-8") as f:
+        data = list(csv.reader(f))
+    if not data or len(data[0]) < 2:
+        raise TravelDataError("缺少批核日及到達日。")
+
+    approval = parse_date(data[0][0])
+    arrival = parse_date(data[0][1])
+    if not approval or not arrival:
+        error = date_error(data[0][0]) or date_error(data[0][1])
+        raise TravelDataError(f"批核日或到達日：{error}。")
+
+    # 一次過檢查所有行，列出全部錯誤；重疊及重複的行程記錄在 record.issues
+    rows = [(line_no, r[0] if len(r) > 0 else "", r[1] if len(r) > 1 else "")
+            for line_no, r in enumerate(data[1:], start=2)]
+    report = normalize_trips(rows, first_line=2)
+    if report.errors:
+        raise TravelDataError("\n".join(map(str, report.errors)))
+    trips = [(*report.trips[line_no], r[2] if len(r) > 2 else "")
+             for line_no, r in enumerate(data[1:], start=2) if line_no in report.trips]
+
+    return TravelRecord(approval, arrival, trips, data[0][2] if len(data[0]) > 2 else "", str(path), report.warnings)
+
+
+def calculate_record(record, today=None):
+    return calculate(record.approval, record.arrival, record.trips, today)
+
+
+def format_result(result):
+    lines = [
+        f"總離境日數：{result.total_days}",
+        f"過去365日離境日數（{result.past_365_start}–{result.today}）：{result.past_365_days} 日",
+        f"任意365日內最多離境：{result.max_365_days}日 (剩餘 {result.max_365_remain} 日)",
+        f"入籍計算期（{result.ilr_start}–{result.ilr_end}）離境日數：{result.ilr_days}（剩餘 {result.ilr_remain} 日）",
+        f"最後一年離境日數（{result.final_year_start}–{result.final_year_end}）：{result.final_year_days}（剩餘 {result.final_year_remain} 日）",
+    ]
+    for count, start, end in result.max_365_periods[:5]:
+        if count <= LIMIT_365:
+            break
+        lines.append(f"  超額：{start}–{end}：{count}日 (超額 {count - LIMIT_365} 日)")
+    return "\n".join(lines)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m travel_calc", description="BNO Visa 離境日數計算（無需視窗）")
+    parser.add_argument("files", nargs="+", help="bno_travel_data.csv 格式的檔案")
+    parser.add_argument("--json", action="store_true", help="以 JSON 輸出結果")
+    parser.add_argument("--today", help="以指定日期 (yyyy-mm-dd) 代替今日計算過去365日")
+    parser.add_argument("--rules", nargs="+", metavar="NAME",
+                        help=f"以規則集計算（內置：{'、'.join(RULE_SETS)}；亦可用 --rules-file 載入的名稱）")
+    parser.add_argument("--rules-file", help="載入自訂規則集的 JSON 檔案")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    today = None
+    if args.today:
+        today = parse_date(args.today)
+        if not today:
+            print(f"日期格式錯誤：{args.today}", file=sys.stderr)
+            return 2
+
+    rule_sets = None
+    if args.rules or args.rules_file:
+        available = dict(RULE_SETS)
+        try:
+            if args.rules_file:
+                loaded = load_rule_sets(args.rules_file)
+                available.update((rule_set.name, rule_set) for rule_set in loaded)
+        except (OSError, RuleSetError) as e:
+            print(f"{args.rules_file}: {e}", file=sys.stderr)
+            return 2
+        names = args.rules or [rule_set.name for rule_set in loaded]
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            print(f"沒有此規則集：{'、'.join(unknown)}", file=sys.stderr)
+            return 2
+        rule_sets = [available[name] for name in names]
+
+    status = 0
+    outputs = []
+    for path in args.files:
+        try:
+            record = read_record(path)
+            for issue in record.issues:
+                print(f"{path}: {issue}", file=sys.stderr)
+            if rule_sets:
+                result = evaluate_rules(record.approval, record.arrival, record.trips, rule_sets, today)
+            else:
+                result = calculate_record(record, today)
+        except (OSError, TravelDataError) as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            status = 1
+            continue
+        if args.json:
+            if rule_sets:
+                outputs.append({"file": path, "rule_sets": [r.to_dict() for r in result]})
+            else:
+                outputs.append({"file": path, **result.to_dict()})
+        else:
+            if len(args.files) > 1:
+                print(f"== {path} ==")
+            print(format_rule_results(result) if rule_sets else format_result(result))
+
+    if args.json:
+        json.dump(outputs if len(args.files) > 1 else (outputs[0] if outputs else None),
+                  sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
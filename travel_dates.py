@@ -0,0 +1,79 @@
+from datetime import date
+from functools import lru_cache
+
+# 同一批日期文字會在計算、標籤及載入時重覆出現，只解析一次
+CACHE_SIZE = 4096
+
+REASON_EMPTY = "empty"
+REASON_FORMAT = "format"
+REASON_INVALID = "invalid"
+
+MESSAGES = {
+    REASON_EMPTY: "未填寫日期",
+    REASON_FORMAT: "日期格式錯誤（可用 yyyy-mm-dd、yyyy/m/d 或 yyyymmdd）",
+    REASON_INVALID: "日期不存在",
+}
+
+
+class DateParseError(ValueError):
+    def __init__(self, text, reason):
+        super().__init__(f"{MESSAGES[reason]}：{text}" if text else MESSAGES[reason])
+        self.text = text
+        self.reason = reason
+
+
+def _split(text):
+    if len(text) == 8 and text.isdigit():
+        return text[:4], text[4:6], text[6:]
+    for separator in ("-", "/"):
+        parts = text.split(separator)
+        if len(parts) == 3:
+            return parts
+    return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse(text):
+    # 回傳 date，或錯誤原因（錯誤亦會被快取）
+    if not text:
+        return REASON_EMPTY
+
+    # 常見的 yyyy-mm-dd 直接取值，不經 strptime
+    if len(text) == 10 and text[4] == "-" and text[7] == "-":
+        parts = text[:4], text[5:7], text[8:]
+    else:
+        parts = _split(text)
+
+    if (parts is None or len(parts[0]) != 4 or not all(1 <= len(p) <= 2 for p in parts[1:])
+            or not all(p.isascii() and p.isdigit() for p in parts)):
+        return REASON_FORMAT
+    try:
+        return date(int(parts[0]), int(parts[1]), int(parts[2]))
+    except ValueError:
+        return REASON_INVALID
+
+
+def parse_date_strict(text):
+    # 解析失敗時拋出 DateParseError
+    text = (text or "").strip()
+    result = _parse(text)
+    if isinstance(result, str):
+        raise DateParseError(text, result)
+    return result
+
+
+def parse_date(text):
+    # 解析失敗時回傳 None
+    result = _parse((text or "").strip())
+    return None if isinstance(result, str) else result
+
+
+def date_error(text):
+    # 回傳 DateParseError，日期正確時回傳 None
+    text = (text or "").strip()
+    result = _parse(text)
+    return DateParseError(text, result) if isinstance(result, str) else None
+
+
+def cache_info():
+    return _parse.cache_info()
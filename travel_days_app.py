@@ -1,17 +1,45 @@
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import messagebox, ttk
 from datetime import datetime, timedelta
-import csv
-import os
-import webbrowser 
-from dateutil.relativedelta import relativedelta 
+import time
+from travel_dates import date_error, parse_date
+from travel_rules import DEFAULT_RULE_SET
+from travel_normalize import ERROR_KINDS, normalize_trips
+from travel_profile import profiled, profiler, session, stage, timed
+from travel_storage import StoredData, new_row_key, open_store
 
 DATA_FILE = "bno_travel_data.csv"
+DB_FILE = "bno_travel_data.db"
+
+# 表格每行的365日標籤使用任意365日規則的上限及 report 數目
+RULE_365 = DEFAULT_RULE_SET.rule("max_365")
 
 COLOR_NORMAL = "black"
 COLOR_YELLOW = "orange"
 COLOR_ORANGE = "#FF6600"
 COLOR_RED = "red"
+# Rule.level 的顏色：0 為正常，剩餘日數每低於一個警告級別加一級，超額時為最高級別
+LEVEL_COLORS = (COLOR_NORMAL, COLOR_YELLOW, COLOR_ORANGE, COLOR_RED)
+
+# 背景工作完成與否的檢查間隔（毫秒）
+POLL_MS = 20
+
+TABLE_COLUMNS = ("out", "in", "count", "activity")
+ROW_FIELDS = {"out": "out_date", "in": "in_date", "activity": "activity"}
+
+
+class TripRow:
+    # 表格中一行的資料；iid 為 Treeview 項目編號，亦用作計算引擎的 key
+    # position 為儲存時的排列位置：新增時取最後一行之後，刪除其他行時不變
+    __slots__ = ("iid", "position", "out_date", "in_date", "activity", "count_365")
+
+    def __init__(self, iid, position, out_date="", in_date="", activity=""):
+        self.iid = iid
+        self.position = position
+        self.out_date = out_date
+        self.in_date = in_date
+        self.activity = activity
+        self.count_365 = None
 
 
 class TravelApp:
@@ -23,9 +51,19 @@ class TravelApp:
         self.root.configure(bg="#f0f0f0")
         
         self.is_saved = True
+        self.edit_serial = 0
+        self.store = open_store(DATA_FILE, DB_FILE)
+        # 家庭模式（只適用於 SQLite）：每個成員一個 profile，行程可由多個成員共用
+        self.profile = getattr(self.store, "profile", None)
+        self.profile_names = self.store.profiles() if self.store.multi_profile else []
+        self.household = None
+        self.combo_profile = None
+        self.summary_window = None
+        self.summary_table = None
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
         self.rows = [] 
+        self.next_position = 0
         self.entry_approval = None
         self.entry_arrival = None
         
@@ -33,26 +71,84 @@ class TravelApp:
         self.lbl_max_365 = None 
         self.lbl_period = None
         self.lbl_final_year = None 
+        self.lbl_eligible = None
         self.lbl_save_date = None
         self.lbl_past_365 = None 
         self.max_365_periods = [] 
+        self.engine = None
+        self.entry_plan_departure = None
+        self.lbl_plan = None
+        self.lbl_timing = None
+        self.lbl_busy = None
+        self.lbl_issues = None
+        self.load_seconds = 0.0
+        # 行程檢查結果：{行: 問題類別}
+        self.row_issues = {}
         
-        self.canvas = None
-        self.scrollable_frame = None 
+        # 計算及檔案讀寫在背景執行緒進行；只有一個工作執行緒，儲存會按次序完成（第一次使用時才建立）
+        self.executor = None
+        self.busy_jobs = 0
+        self.calc_future = None
+        self.calc_generation = 0
+        self.eligibility_future = None
+        self.eligibility_generation = 0
+        self.live_calculation = tk.BooleanVar(value=True)
+        
+        self.table = None
+        self.row_by_iid = {}
+        self.cell_editor = None
+        self.editing = None
+        self.debug_window = None
+        self.debug_table = None
         
         self.create_widgets()
-        self.load_data()
-        self.calculate_days() 
+        if profiler.enabled:
+            self.root.bind("<F12>", lambda e: self.toggle_debug_panel())
+        # 先顯示空白視窗；第一次繪畫完成後才在背景載入資料，顯示後再計算
+        self.root.after_idle(self.root.after, 0, lambda: self.load_data(then=self.calculate_days))
     
     def on_closing(self):
         if not self.is_saved:
             if messagebox.askyesnocancel("儲存確認", "有未儲存的資料，您想在退出前儲存嗎？"):
-                self.save_data()
-                self.root.destroy()
+                self.save_data(then=self.shutdown)
             elif messagebox.askyesno("退出確認", "您確定要退出且不儲存資料嗎？"):
-                self.root.destroy()
+                self.shutdown()
         else:
-            self.root.destroy()
+            self.shutdown()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        self.store.close()
+        self.root.destroy()
+
+    def run_async(self, func, on_done):
+        # 在背景執行 func，完成後透過 root.after 在主執行緒呼叫 on_done(結果)
+        if self.executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bno-worker")
+        future = self.executor.submit(profiled(func))
+        self.set_busy(1)
+
+        def poll():
+            if not future.done():
+                self.root.after(POLL_MS, poll)
+                return
+            self.set_busy(-1)
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error:
+                messagebox.showerror("錯誤", str(error))
+            else:
+                on_done(future.result())
+
+        self.root.after(POLL_MS, poll)
+        return future
+
+    def set_busy(self, delta):
+        self.busy_jobs += delta
+        self.lbl_busy.config(text="⏳ 計算中…" if self.busy_jobs > 0 else "")
     
     def auto_hyphenate_date(self, event):
         entry = event.widget
@@ -68,8 +164,46 @@ class TravelApp:
     
     def mark_unsaved(self, event=None):
         self.is_saved = False
+        self.edit_serial += 1
+
+    def autosave(self, job):
+        # 只適用於支援逐行更新的儲存方式（SQLite）；期間沒有其他修改的話視為已儲存
+        serial = self.edit_serial
+
+        def saved(_):
+            if serial == self.edit_serial:
+                self.is_saved = True
+
+        self.run_async(job, saved)
+
+    def autosave_row(self, row):
+        if self.store.autosave:
+            args = (row.iid, row.position, row.out_date, row.in_date, row.activity, self.profile)
+            self.autosave(lambda: self.store.upsert_row(*args))
+        if self.household is not None:
+            self.household.set_trip(row.iid, parse_date(row.out_date), parse_date(row.in_date), [self.profile])
+            self.refresh_household_summary()
+
+    def autosave_rows_deleted(self, keys):
+        profile = self.profile
+        if self.store.autosave:
+            self.autosave(lambda: self.store.delete_rows(keys, profile))
+        if self.household is not None:
+            for key in keys:
+                self.household.unshare_trip(key, profile)
+            self.refresh_household_summary()
+
+    def autosave_stay(self, event=None):
+        approval, arrival = self.entry_approval.get().strip(), self.entry_arrival.get().strip()
+        profile = self.profile
+        if self.store.autosave:
+            self.autosave(lambda: self.store.set_stay(approval, arrival, profile=profile))
+        if self.household is not None:
+            self.household.set_member(profile, parse_date(approval), parse_date(arrival))
+            self.refresh_household_summary()
         
     def open_readme(self):
+        import webbrowser
         url = 'https://github.com/ICHTBAA/bno_visa_cal'
         try:
             webbrowser.open_new_tab(url)
@@ -77,38 +211,22 @@ class TravelApp:
             messagebox.showerror("瀏覽器錯誤", f"無法開啟網頁：{url}\n錯誤信息: {e}")
 
     def parse_date(self, text):
-        try:
-            return datetime.strptime(text.strip(), "%Y-%m-%d").date()
-        except:
-            return None
+        return parse_date(text)
 
     def validate_date(self, entry):
         value = entry.get().strip()
-        if value == "":
+        self.mark_unsaved()
+        if value == "" or not date_error(value):
+            if value and value != parse_date(value).isoformat():
+                entry.delete(0, tk.END)
+                entry.insert(0, parse_date(value).isoformat())
             entry.config(bg="white")
-            self.mark_unsaved() 
             return True
-        try:
-            datetime.strptime(value, "%Y-%m-%d")
-            entry.config(bg="white")
-            self.mark_unsaved()
-            return True
-        except ValueError:
-            entry.config(bg="#ffcccc")
-            self.mark_unsaved()
-            return False
+        entry.config(bg="#ffcccc")
+        return False
 
-    def color_label(self, label, remain, thresholds):
-        if remain < 0:
-            label.config(fg=COLOR_RED)
-        elif remain <= thresholds[2]:
-            label.config(fg=COLOR_RED)
-        elif remain <= thresholds[1]:
-            label.config(fg=COLOR_ORANGE)
-        elif remain <= thresholds[0]:
-            label.config(fg=COLOR_YELLOW)
-        else:
-            label.config(fg=COLOR_NORMAL)
+    def color_label(self, label, remain, rule):
+        label.config(fg=LEVEL_COLORS[min(rule.level(remain), len(LEVEL_COLORS) - 1)])
 
     def create_widgets(self):
         
@@ -118,7 +236,7 @@ class TravelApp:
         tk.Label(frame_static_top, text="批核日", bg="#f0f0f0", font=("Microsoft JhengHei", 10)).grid(row=0, column=0, padx=10, pady=(0, 3), sticky='w')
         tk.Label(frame_static_top, text="到達日", bg="#f0f0f0", font=("Microsoft JhengHei", 10)).grid(row=0, column=1, padx=10, pady=(0, 3), sticky='w')
         
-        tk.Label(frame_static_top, text="日期格式：yyyy-mm-dd", bg="#f0f0f0", fg="#555", font=("Microsoft JhengHei", 9)).grid(row=0, column=2, padx=(10, 5), pady=(0, 3), columnspan=3, sticky="e") 
+        tk.Label(frame_static_top, text="日期格式：yyyy-mm-dd　雙擊表格編輯", bg="#f0f0f0", fg="#555", font=("Microsoft JhengHei", 9)).grid(row=0, column=2, padx=(10, 5), pady=(0, 3), columnspan=3, sticky="e") 
 
         self.entry_approval = tk.Entry(frame_static_top, width=15, justify="center")
         self.entry_arrival = tk.Entry(frame_static_top, width=15, justify="center")
@@ -130,6 +248,19 @@ class TravelApp:
         tk.Label(frame_static_top, text="", width=15, bg="#f0f0f0").grid(row=1, column=3, padx=10, pady=(0, 10)) 
         tk.Label(frame_static_top, text="", width=5, bg="#f0f0f0").grid(row=1, column=4, padx=5, pady=(0, 10)) 
 
+        if self.store.multi_profile:
+            frame_household = tk.Frame(self.root, bg="#f0f0f0")
+            frame_household.pack(padx=10, pady=(0, 5), fill='x')
+            tk.Label(frame_household, text="成員", bg="#f0f0f0", font=("Microsoft JhengHei", 10)).pack(side=tk.LEFT, padx=(10, 5))
+            self.combo_profile = ttk.Combobox(frame_household, width=12, state="readonly",
+                                              values=self.profile_names or [self.profile])
+            self.combo_profile.set(self.profile)
+            self.combo_profile.pack(side=tk.LEFT)
+            self.combo_profile.bind("<<ComboboxSelected>>", lambda e: self.switch_profile(self.combo_profile.get()))
+            tk.Button(frame_household, text="＋ 成員", width=8, command=self.add_member).pack(side=tk.LEFT, padx=5)
+            tk.Button(frame_household, text="👥 同行", width=8, command=self.share_selected).pack(side=tk.LEFT, padx=5)
+            tk.Button(frame_household, text="👪 家庭總覽", width=10, command=self.show_household).pack(side=tk.LEFT, padx=5)
+
         self.entry_approval.bind("<FocusOut>", lambda e: self.validate_date(self.entry_approval))
         self.entry_arrival.bind("<FocusOut>", lambda e: self.validate_date(self.entry_arrival))
         
@@ -137,42 +268,64 @@ class TravelApp:
         self.entry_arrival.bind("<KeyRelease>", self.auto_hyphenate_date)
         self.entry_approval.bind("<KeyRelease>", self.mark_unsaved, add='+')
         self.entry_arrival.bind("<KeyRelease>", self.mark_unsaved, add='+')
+        for entry in (self.entry_approval, self.entry_arrival):
+            entry.bind("<KeyRelease>", self.on_stay_edited, add='+')
+            entry.bind("<FocusOut>", self.on_stay_edited, add='+')
+            entry.bind("<FocusOut>", self.autosave_stay, add='+')
         
-        frame_scroll_container = tk.Frame(self.root)
-        frame_scroll_container.pack(fill="both", expand=True, padx=10)
+        frame_table = tk.Frame(self.root)
+        frame_table.pack(fill="both", expand=True, padx=10)
 
-        scrollbar = tk.Scrollbar(frame_scroll_container, orient="vertical")
+        scrollbar = tk.Scrollbar(frame_table, orient="vertical")
         
-        self.canvas = tk.Canvas(frame_scroll_container, yscrollcommand=scrollbar.set, bg="#f0f0f0")
+        self.table = ttk.Treeview(frame_table, columns=TABLE_COLUMNS, show="headings", selectmode="extended",
+                                  yscrollcommand=scrollbar.set)
 
-        scrollbar.config(command=self.canvas.yview)
+        scrollbar.config(command=self.on_table_scroll)
         scrollbar.pack(side="right", fill="y")
-        self.canvas.pack(side="left", fill="both", expand=True)
+        self.table.pack(side="left", fill="both", expand=True)
 
-        self.scrollable_frame = tk.Frame(self.canvas, bg="#f0f0f0")
+        for column, text, width, anchor in (("out", "出國日", 140, "center"), ("in", "回國日", 140, "center"),
+                                            ("count", "365日離境", 100, "center"), ("activity", "活動", 320, "w")):
+            self.table.heading(column, text=text)
+            self.table.column(column, width=width, anchor=anchor)
+        self.table.tag_configure("orange", foreground=COLOR_ORANGE)
+        self.table.tag_configure("red", foreground=COLOR_RED)
+        self.table.tag_configure("invalid", background="#ffcccc")
+        self.table.tag_configure("overlap", background="#fff2cc")
 
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw", 
-                                   tags="self.scrollable_frame")
+        self.table.bind("<Double-1>", self.on_table_double_click)
+        self.table.bind("<Return>", lambda e: self.begin_cell_edit(self.table.focus(), "out"))
+        self.table.bind("<Delete>", lambda e: self.delete_selected())
+        self.table.bind("<MouseWheel>", self.commit_cell_edit, add='+')
 
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.config(
-                scrollregion=self.canvas.bbox("all")
-            )
-        )
-        
-        tk.Label(self.scrollable_frame, text="出國日", bg="#f0f0f0", font=("Microsoft JhengHei", 10)).grid(row=0, column=0, padx=10, pady=(0, 3))
-        tk.Label(self.scrollable_frame, text="回國日", bg="#f0f0f0", font=("Microsoft JhengHei", 10)).grid(row=0, column=1, padx=10, pady=(0, 3))
-        tk.Label(self.scrollable_frame, text="365日離境", bg="#f0f0f0", font=("Microsoft JhengHei", 10)).grid(row=0, column=2, padx=5, pady=(0, 3)) 
-        tk.Label(self.scrollable_frame, text="活動", bg="#f0f0f0", font=("Microsoft JhengHei", 10)).grid(row=0, column=3, padx=10, pady=(0, 3)) 
-        tk.Label(self.scrollable_frame, text="刪除", bg="#f0f0f0", font=("Microsoft JhengHei", 10)).grid(row=0, column=4, padx=10, pady=(0, 3)) 
+        # 只有一個編輯欄，雙擊儲存格時移到該格上重用
+        self.cell_editor = tk.Entry(self.table, justify="center")
+        self.cell_editor.bind("<KeyRelease>", self.on_cell_key)
+        self.cell_editor.bind("<Return>", self.commit_cell_edit)
+        self.cell_editor.bind("<FocusOut>", self.commit_cell_edit)
+        self.cell_editor.bind("<Escape>", self.cancel_cell_edit)
+        self.cell_editor.bind("<Tab>", self.next_cell_edit)
 
         frame_buttons = tk.Frame(self.root, bg="#f0f0f0")
         frame_buttons.pack(pady=5)
-        tk.Button(frame_buttons, text="＋ 新增一行", width=10, command=self.add_row).grid(row=0, column=0, padx=5)
+        tk.Button(frame_buttons, text="＋ 新增一行", width=10, command=self.add_row_and_edit).grid(row=0, column=0, padx=5)
         tk.Button(frame_buttons, text="🗑 刪除選取", width=10, command=self.delete_selected).grid(row=0, column=1, padx=5)
         tk.Button(frame_buttons, text="💾 儲存", width=10, command=self.save_data).grid(row=0, column=2, padx=5)
         tk.Button(frame_buttons, text="📊 計算", width=10, command=self.calculate_days).grid(row=0, column=3, padx=5)
+        tk.Checkbutton(frame_buttons, text="即時計算", variable=self.live_calculation, bg="#f0f0f0").grid(row=0, column=4, padx=5)
+        tk.Button(frame_buttons, text="📈 匯出逐日", width=10, command=self.export_days).grid(row=0, column=5, padx=5)
+
+        frame_planner = tk.Frame(self.root, bg="#f0f0f0")
+        frame_planner.pack(pady=(5, 0))
+        tk.Label(frame_planner, text="計劃出國日", bg="#f0f0f0", font=("Microsoft JhengHei", 10)).grid(row=0, column=0, padx=5)
+        self.entry_plan_departure = tk.Entry(frame_planner, width=15, justify="center")
+        self.entry_plan_departure.grid(row=0, column=1, padx=5)
+        self.entry_plan_departure.bind("<KeyRelease>", self.auto_hyphenate_date)
+        self.entry_plan_departure.bind("<Return>", lambda e: self.plan_trip())
+        tk.Button(frame_planner, text="🧭 最遲回國日", width=12, command=self.plan_trip).grid(row=0, column=2, padx=5)
+        self.lbl_plan = tk.Label(frame_planner, text="", bg="#f0f0f0", font=("Microsoft JhengHei", 9))
+        self.lbl_plan.grid(row=1, column=0, columnspan=3, pady=(3, 0))
 
         frame_results = tk.Frame(self.root, bg="#f0f0f0")
         frame_results.pack(pady=10)
@@ -194,6 +347,12 @@ class TravelApp:
         self.lbl_final_year = tk.Label(frame_results, text="最後一年離境日數：N/A", bg="#f0f0f0", font=result_font)
         self.lbl_final_year.pack()
 
+        self.lbl_eligible = tk.Label(frame_results, text="最早可申請入籍日：N/A", bg="#f0f0f0", font=result_font)
+        self.lbl_eligible.pack()
+
+        self.lbl_issues = tk.Label(frame_results, text="", bg="#f0f0f0", font=result_font, fg=COLOR_RED)
+        self.lbl_issues.pack()
+
         frame_footer = tk.Frame(self.root, bg="#f0f0f0")
         frame_footer.pack(fill='x', padx=10, pady=(0, 10))
         
@@ -202,148 +361,436 @@ class TravelApp:
         
         tk.Button(frame_footer, text="💡 Read Me", command=self.open_readme).pack(side=tk.RIGHT)
 
-    def add_row(self, out_date="", in_date="", activity=""): 
-        row = []
-        new_row_index = 1 + len(self.rows) 
-        
-        parent_frame = self.scrollable_frame
-        
-        entry_out = tk.Entry(parent_frame, width=15, justify="center")
-        entry_out.grid(row=new_row_index, column=0, padx=10, pady=(0, 5))
-        entry_out.bind("<FocusOut>", lambda e: self.validate_date(entry_out))
-        entry_out.bind("<KeyRelease>", self.auto_hyphenate_date)
-        entry_out.bind("<KeyRelease>", self.mark_unsaved, add='+')
-        entry_out.insert(0, out_date)
-        row.append(entry_out)
-        
-        entry_in = tk.Entry(parent_frame, width=15, justify="center")
-        entry_in.grid(row=new_row_index, column=1, padx=10, pady=(0, 5))
-        entry_in.bind("<FocusOut>", lambda e: self.validate_date(entry_in))
-        entry_in.bind("<KeyRelease>", self.auto_hyphenate_date)
-        entry_in.bind("<KeyRelease>", self.mark_unsaved, add='+')
-        entry_in.insert(0, in_date)
-        row.append(entry_in)
-
-        lbl_365_count = tk.Label(parent_frame, text="-", bg="#f0f0f0", width=10, font=("Microsoft JhengHei", 10))
-        lbl_365_count.grid(row=new_row_index, column=2, padx=5, pady=(0, 5))
-        row.append(lbl_365_count)
-        
-        entry_activity = tk.Entry(parent_frame, width=15, justify="left")
-        entry_activity.grid(row=new_row_index, column=3, padx=10, pady=(0, 5))
-        entry_activity.bind("<KeyRelease>", self.mark_unsaved)
-        entry_activity.insert(0, activity)
-        row.append(entry_activity) 
-        
-        var = tk.BooleanVar()
-        chk = tk.Checkbutton(parent_frame, variable=var, bg="#f0f0f0", command=self.mark_unsaved)
-        chk.grid(row=new_row_index, column=4, padx=5)
-        row.append(var)
+        self.lbl_busy = tk.Label(frame_footer, text="", bg="#f0f0f0", font=("Microsoft JhengHei", 9), fg="#555")
+        self.lbl_busy.pack(side=tk.LEFT, padx=10)
+
+        self.lbl_timing = tk.Label(frame_footer, text="", bg="#f0f0f0", font=("Microsoft JhengHei", 9), fg="#888")
+        self.lbl_timing.pack(side=tk.RIGHT, padx=10)
 
+    def add_row(self, out_date="", in_date="", activity=""): 
+        iid = self.table.insert("", tk.END, iid=new_row_key(), values=(out_date, in_date, "-", activity))
+        row = TripRow(iid, self.next_position, out_date, in_date, activity)
+        self.next_position += 1
         self.rows.append(row)
-        
-        self.scrollable_frame.update_idletasks()
-        self.canvas.config(scrollregion=self.canvas.bbox("all"))
+        self.row_by_iid[iid] = row
+        self.render_row(row)
+        return row
 
-    def redraw_rows(self):
-        
-        parent_frame = self.scrollable_frame
-        
-        for widget in parent_frame.winfo_children():
-            row_info = widget.grid_info().get("row")
-            if row_info is not None and row_info >= 1:
-                if isinstance(widget, tk.Checkbutton):
-                    widget.destroy()
-                elif isinstance(widget, tk.Entry) or isinstance(widget, tk.Label): 
-                    widget.grid_forget()
+    def add_row_and_edit(self):
+        row = self.add_row()
+        self.table.see(row.iid)
+        self.table.selection_set(row.iid)
+        self.begin_cell_edit(row.iid, "out")
 
-        for i, row in enumerate(self.rows):
-            current_row_index = 1 + i
-            
-            row[0].grid(row=current_row_index, column=0, padx=10, pady=(0, 5))
-            row[1].grid(row=current_row_index, column=1, padx=10, pady=(0, 5))
-            row[2].grid(row=current_row_index, column=2, padx=5, pady=(0, 5))
-            row[3].grid(row=current_row_index, column=3, padx=10, pady=(0, 5))
-            
-            chk = tk.Checkbutton(parent_frame, variable=row[4], bg="#f0f0f0", command=self.mark_unsaved)
-            chk.grid(row=current_row_index, column=4, padx=5)
-            
-        parent_frame.update_idletasks()
-        self.canvas.config(scrollregion=self.canvas.bbox("all"))
+    def row_tags(self, row):
+        tags = []
+        if row.count_365 is not None:
+            if row.count_365 > RULE_365.limit:
+                tags.append("red")
+            elif row.count_365 >= RULE_365.report:
+                tags.append("orange")
+        issue = self.row_issues.get(row.iid)
+        if issue in ERROR_KINDS or any(text.strip() and not self.parse_date(text) for text in (row.out_date, row.in_date)):
+            tags.append("invalid")
+        elif issue:
+            tags.append("overlap")
+        return tags
 
+    def render_row(self, row):
+        count_text = "-" if row.count_365 is None else str(row.count_365)
+        self.table.item(row.iid, values=(row.out_date, row.in_date, count_text, row.activity), tags=self.row_tags(row))
 
-    def delete_selected(self):
-        new_rows = []
-        deleted = False
-        for row in self.rows:
-            if row[4].get():
-                for widget in row[:4]: 
-                    widget.destroy()
-                deleted = True
-            else:
-                new_rows.append(row)
-        
-        if deleted:
+    @timed("load_rows")
+    def load_rows(self, lines, positions=None):
+        # 一次過讀入多行 (key, 出國日, 回國日, 活動)：每行只插入表格一次，最後才更新一次版面
+        # positions 為儲存的排列位置（與 lines 對應）；沒有時按次序編號
+        self.clear_rows()
+        lines = list(lines)
+        for (key, out_date, in_date, activity), position in zip(lines, positions or range(len(lines))):
+            row = TripRow(key, position, out_date.strip(), in_date.strip(), activity.strip())
+            self.table.insert("", tk.END, iid=key, values=(row.out_date, row.in_date, "-", row.activity),
+                              tags=self.row_tags(row))
+            self.rows.append(row)
+            self.row_by_iid[row.iid] = row
+            self.next_position = max(self.next_position, position + 1)
+        self.table.update_idletasks()
+
+    def toggle_debug_panel(self):
+        # 只在設定 BNO_PROFILE 時提供（F12），列出每個階段的次數及時間
+        if self.debug_window is not None:
+            self.debug_window.destroy()
+            self.debug_window = self.debug_table = None
+            return
+
+        window = tk.Toplevel(self.root)
+        window.title("效能記錄")
+        columns = ("stage", "count", "last", "average", "worst")
+        table = ttk.Treeview(window, columns=columns, show="headings", height=16)
+        for column, text, width in (("stage", "階段", 220), ("count", "次數", 60), ("last", "最近 (ms)", 90),
+                                    ("average", "平均 (ms)", 90), ("worst", "最長 (ms)", 90)):
+            table.heading(column, text=text)
+            table.column(column, width=width, anchor="w" if column == "stage" else "e")
+        table.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+        tk.Button(window, text="重設", width=10, command=profiler.reset).pack(pady=(0, 10))
+        window.protocol("WM_DELETE_WINDOW", self.toggle_debug_panel)
+        self.debug_window, self.debug_table = window, table
+        self.refresh_debug_panel()
+
+    def refresh_debug_panel(self):
+        if self.debug_table is None:
+            return
+        self.debug_table.delete(*self.debug_table.get_children())
+        for name, count, last, average, worst in profiler.snapshot():
+            self.debug_table.insert("", tk.END, values=(name, count, f"{last * 1000:.2f}",
+                                                        f"{average * 1000:.2f}", f"{worst * 1000:.2f}"))
+        self.root.after(500, self.refresh_debug_panel)
+
+    def show_timing(self, load_seconds, calculate_seconds):
+        self.lbl_timing.config(text=f"載入 {load_seconds * 1000:.0f} ms｜計算 {calculate_seconds * 1000:.0f} ms")
+
+    def clear_rows(self):
+        self.commit_cell_edit()
+        self.table.delete(*self.table.get_children())
+        self.rows = []
+        self.row_by_iid = {}
+        self.next_position = 0
+
+    def on_table_scroll(self, *args):
+        self.commit_cell_edit()
+        self.table.yview(*args)
+
+    def on_table_double_click(self, event):
+        iid = self.table.identify_row(event.y)
+        column = self.table.identify_column(event.x)
+        if iid and column:
+            self.begin_cell_edit(iid, TABLE_COLUMNS[int(column[1:]) - 1])
+
+    def begin_cell_edit(self, iid, column):
+        self.commit_cell_edit()
+        if not iid or column not in ROW_FIELDS:
+            return
+        self.table.see(iid)
+        bbox = self.table.bbox(iid, column)
+        if not bbox:
+            return
+        row = self.row_by_iid[iid]
+        value = getattr(row, ROW_FIELDS[column])
+        self.editing = (iid, column, value)
+
+        x, y, width, height = bbox
+        editor = self.cell_editor
+        editor.config(justify="left" if column == "activity" else "center", bg="white")
+        editor.delete(0, tk.END)
+        editor.insert(0, value)
+        editor.place(x=x, y=y, width=width, height=height)
+        editor.focus_set()
+        editor.select_range(0, tk.END)
+
+    def on_cell_key(self, event):
+        if not self.editing:
+            return
+        iid, column, _ = self.editing
+        if column != "activity":
+            self.auto_hyphenate_date(event)
+        row = self.row_by_iid[iid]
+        value = self.cell_editor.get().strip()
+        if getattr(row, ROW_FIELDS[column]) == value:
+            return
+        setattr(row, ROW_FIELDS[column], value)
+        self.mark_unsaved()
+        if column != "activity":
+            self.on_row_edited(row)
+        self.render_row(row)
+
+    def commit_cell_edit(self, event=None):
+        if not self.editing:
+            return
+        iid, column, original = self.editing
+        self.editing = None
+        value = self.cell_editor.get().strip()
+        self.cell_editor.place_forget()
+        if column != "activity" and parse_date(value):
+            value = parse_date(value).isoformat()
+        row = self.row_by_iid.get(iid)
+        if row is None:
+            return
+        setattr(row, ROW_FIELDS[column], value)
+        if value != original:
             self.mark_unsaved()
-            
-        self.rows = new_rows
-        
-        self.redraw_rows()
+            self.autosave_row(row)
+        if column != "activity":
+            self.on_row_edited(row)
+        self.render_row(row)
+        self.table.focus_set()
+
+    def cancel_cell_edit(self, event=None):
+        if not self.editing:
+            return
+        iid, column, original = self.editing
+        self.cell_editor.delete(0, tk.END)
+        self.cell_editor.insert(0, original)
+        self.commit_cell_edit()
+
+    def next_cell_edit(self, event=None):
+        if not self.editing:
+            return "break"
+        iid, column, _ = self.editing
+        order = [c for c in TABLE_COLUMNS if c in ROW_FIELDS]
+        position = order.index(column) + 1
+        if position < len(order):
+            self.begin_cell_edit(iid, order[position])
+            return "break"
+        index = self.table.index(iid) + 1
+        children = self.table.get_children()
+        self.commit_cell_edit()
+        if index < len(children):
+            self.begin_cell_edit(children[index], order[0])
+        return "break"
+
+    @timed("delete_selected")
+    def delete_selected(self):
+        self.commit_cell_edit()
+        selected = set(self.table.selection())
+        if not selected:
+            return
+
+        affected = set()
+        for iid in selected:
+            if self.engine:
+                affected |= self.engine.remove_trip(iid)
+            self.row_by_iid.pop(iid, None)
+        self.rows = [row for row in self.rows if row.iid not in selected]
+        self.table.delete(*selected)
+        self.mark_unsaved()
+        self.autosave_rows_deleted(list(selected))
         
         if not self.rows:
             self.add_row()
+        self.check_trips()
         
-        self.calculate_days()
+        if self.engine and self.calc_future is None:
+            self.show_row_counts([self.row_by_iid[iid] for iid in affected if iid in self.row_by_iid])
+            self.show_result(self.engine.result(include_trips=False))
+        else:
+            self.calculate_days()
+
+    def load_data(self, then=None):
+        # 在背景讀取目前成員的資料（第一次亦建立家庭模式的快取），回到主執行緒顯示後呼叫 then()
+        started = time.perf_counter()
+        profile = self.profile
+        build_household = self.store.multi_profile and self.household is None
 
-    def load_data(self):
-        if not os.path.exists(DATA_FILE):
+        def read():
+            from travel_household import Household
+            with stage("load_data.read"):
+                data = self.store.load(profile)
+                household = Household.from_store(self.store) if build_household else None
+            return data, household
+
+        def loaded(outcome):
+            data, household = outcome
+            if household is not None:
+                self.household = household
+            with stage("load_data.show"):
+                self.show_data(data)
+            self.load_seconds = time.perf_counter() - started
+            if then:
+                then()
+
+        self.run_async(read, loaded)
+
+    def show_data(self, data):
+        self.entry_approval.delete(0, tk.END)
+        self.entry_arrival.delete(0, tk.END)
+        if data is None:
+            self.lbl_save_date.config(text="上次儲存日期：未儲存")
+            self.clear_rows()
             self.add_row()
             return
-            
-        with open(DATA_FILE, newline='', encoding="utf-8") as f:
-            reader = csv.reader(f)
-            data = list(reader)
-            if not data:
-                self.add_row()
-                return
 
-            self.entry_approval.delete(0, tk.END)
-            self.entry_arrival.delete(0, tk.END)
-            self.entry_approval.insert(0, data[0][0])
-            self.entry_arrival.insert(0, data[0][1])
-            if len(data[0]) > 2:
-                self.lbl_save_date.config(text=f"上次儲存日期：{data[0][2]}")
+        self.entry_approval.insert(0, data.approval)
+        self.entry_arrival.insert(0, data.arrival)
+        self.lbl_save_date.config(text=f"上次儲存日期：{data.saved_at}" if data.saved_at else "上次儲存日期：未儲存")
 
-            for row in self.rows:
-                pass 
-            self.rows = []
+        self.load_rows(data.rows, data.positions)
+        if not self.rows:
+            self.add_row()
             
-            for r in data[1:]:
-                out_date = r[0] if len(r) > 0 else ""
-                in_date = r[1] if len(r) > 1 else ""
-                activity = r[2] if len(r) > 2 else ""
-                self.add_row(out_date, in_date, activity)
-            if not self.rows:
-                self.add_row()
-                
-            self.is_saved = True 
+        self.is_saved = True 
+
+    def switch_profile(self, name):
+        # 先把目前成員的修改排入背景儲存，之後才在同一工作執行緒讀取另一成員，確保次序
+        if name == self.profile:
+            return
+        self.commit_cell_edit()
+        self.autosave_stay()
+        self.profile = name
+        self.combo_profile.set(name)
+        self.engine = None
+        self.lbl_plan.config(text="")
+        self.load_data(then=self.calculate_days)
+
+    def household_ready(self):
+        # 家庭資料在背景載入；載入完成前（或載入失敗後）不可使用成員相關功能
+        if self.household is None:
+            messagebox.showinfo("家庭成員", "成員資料仍在載入，請稍後再試。")
+            return False
+        return True
+
+    def add_member(self):
+        if not self.household_ready():
+            return
+        from tkinter import simpledialog
+        name = (simpledialog.askstring("新增成員", "成員名稱：", parent=self.root) or "").strip()
+        if not name:
+            return
+        if name in self.profile_names:
+            messagebox.showwarning("新增成員", f"已有成員「{name}」。")
+            return
+        if not self.profile_names:
+            self.profile_names.append(self.profile)
+        self.profile_names.append(name)
+        self.combo_profile.config(values=self.profile_names)
+        self.household.set_member(name, None, None)
+        self.run_async(lambda: self.store.add_profile(name), lambda _: None)
+        self.switch_profile(name)
+
+    def share_selected(self):
+        # 把選取的行程加入其他成員；共用同一行，之後任何一方修改都會同步
+        if not self.household_ready():
+            return
+        self.commit_cell_edit()
+        keys = [iid for iid in self.table.selection() if iid in self.row_by_iid]
+        others = [name for name in self.profile_names if name != self.profile]
+        if not keys or not others:
+            messagebox.showinfo("同行", "請先選取行程，並新增其他成員。")
+            return
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title("同行成員")
+        dialog.transient(self.root)
+        tk.Label(dialog, text=f"把選取的 {len(keys)} 個行程加入：", font=("Microsoft JhengHei", 10)).pack(padx=20, pady=(10, 5))
+        chosen = {name: tk.BooleanVar(value=False) for name in others}
+        for name in others:
+            tk.Checkbutton(dialog, text=name, variable=chosen[name]).pack(anchor='w', padx=20)
+
+        def confirm():
+            names = [name for name in others if chosen[name].get()]
+            dialog.destroy()
+            if names:
+                self.share_rows(keys, names)
+
+        tk.Button(dialog, text="確定", width=10, command=confirm).pack(pady=10)
+
+    def share_rows(self, keys, names):
+        for key in keys:
+            self.household.share_trip(key, *names)
+        self.autosave(lambda: self.store.share_rows(keys, names))
+        self.refresh_household_summary()
+
+    def show_household(self):
+        if not self.household_ready():
+            return
+        if self.summary_window is not None:
+            self.summary_window.lift()
+            self.refresh_household_summary()
+            return
+
+        window = tk.Toplevel(self.root)
+        window.title("家庭總覽")
+        columns = ("name", "past_365", "max_365", "ilr", "final_year")
+        table = ttk.Treeview(window, columns=columns, show="headings", height=8)
+        for column, text, width in (("name", "成員", 100), ("past_365", "過去365日", 120), ("max_365", "任意365日", 120),
+                                    ("ilr", "入籍計算期", 120), ("final_year", "最後一年", 120)):
+            table.heading(column, text=text)
+            table.column(column, width=width, anchor="w" if column == "name" else "center")
+        table.tag_configure("orange", foreground=COLOR_ORANGE)
+        table.tag_configure("red", foreground=COLOR_RED)
+        table.pack(fill="both", expand=True, padx=10, pady=10)
+        window.protocol("WM_DELETE_WINDOW", self.close_household)
+        self.summary_window, self.summary_table = window, table
+        self.refresh_household_summary()
+
+    def close_household(self):
+        self.summary_window.destroy()
+        self.summary_window = self.summary_table = None
+
+    @timed("refresh_household_summary")
+    def refresh_household_summary(self):
+        # 每個成員的結果已快取，只有改變了的成員會重新計算
+        if self.summary_table is None:
+            return
+        self.summary_table.delete(*self.summary_table.get_children())
+        for name, result, error in self.household.summary():
+            if result is None:
+                values = (name, error or "未輸入批核日及到達日", "", "", "")
+                tags = ["red"] if error else []
+            else:
+                values = (name,
+                          f"{result.past_365_days}（剩餘 {result.past_365_remain}）",
+                          f"{result.max_365_days}（剩餘 {result.max_365_remain}）",
+                          f"{result.ilr_days}（剩餘 {result.ilr_remain}）",
+                          f"{result.final_year_days}（剩餘 {result.final_year_remain}）")
+                if result.breaches:
+                    tags = ["red"]
+                elif result.max_365_days >= RULE_365.report:
+                    tags = ["orange"]
+                else:
+                    tags = []
+            self.summary_table.insert("", tk.END, iid=name, values=values, tags=tags)
 
-    def save_data(self):
+    def save_data(self, then=None):
         now = datetime.now().strftime("%Y-%m-%d %H:%M")
-        rows_data = [[self.entry_approval.get(), self.entry_arrival.get(), now]]
+        self.commit_cell_edit()
+        data = StoredData(self.entry_approval.get().strip(), self.entry_arrival.get().strip(), now)
         for row in self.rows:
-            out_date = row[0].get().strip()
-            in_date = row[1].get().strip()
-            activity = row[3].get().strip()
+            out_date = row.out_date.strip()
+            in_date = row.in_date.strip()
+            activity = row.activity.strip()
             if out_date or in_date:
-                rows_data.append([out_date, in_date, activity])
+                data.rows.append((row.iid, out_date, in_date, activity))
+                data.positions.append(row.position)
 
-        with open(DATA_FILE, "w", newline='', encoding="utf-8") as f:
-            csv.writer(f).writerows(rows_data)
-            
-        self.lbl_save_date.config(text=f"上次儲存日期：{now}")
-        self.is_saved = True 
-        messagebox.showinfo("儲存完成", "資料已儲存。")
-        self.calculate_days()
+        def saved(_):
+            self.lbl_save_date.config(text=f"上次儲存日期：{now}")
+            self.is_saved = True 
+            with stage("save_data.messagebox"):
+                messagebox.showinfo("儲存完成", "資料已儲存。")
+            if then:
+                then()
+            else:
+                self.calculate_days()
+
+        profile = self.profile
+
+        def write():
+            with stage("save_data.write"):
+                self.store.save(data, profile)
+
+        self.run_async(write, saved)
+
+    @timed("check_trips")
+    def check_trips(self):
+        # 一次過檢查所有行（日期錯誤、只填一邊、回國日不晚於出國日、重複、重疊），
+        # 以顏色標示有問題的行並在結果下方顯示摘要，不再逐個錯誤彈出對話框
+        report = normalize_trips((row.iid, row.out_date, row.in_date) for row in self.rows)
+        previous = self.row_issues
+        self.row_issues = {issue.ref: issue.kind for issue in report.issues}
+        for iid in previous.keys() | self.row_issues.keys():
+            if iid in self.row_by_iid and previous.get(iid) != self.row_issues.get(iid):
+                self.render_row(self.row_by_iid[iid])
+        if report.issues:
+            lines = "、".join(str(issue.line) for issue in report.issues[:10])
+            more = "…" if len(report.issues) > 10 else ""
+            self.lbl_issues.config(text=f"⚠ {report.summary()}（第 {lines}{more} 行）")
+        else:
+            self.lbl_issues.config(text="")
+        return report
+
+    def collect_trips(self):
+        # 回傳可計算的 {行: (出國日, 回國日)}；有錯誤的行會被略過
+        # 重疊的行仍按行保留，以便顯示每行的365日離境日數（計算引擎以覆蓋次數處理重疊，不會重覆計算）
+        return self.check_trips().trips
 
     def calculate_days(self):
         
@@ -351,121 +798,170 @@ class TravelApp:
         arrival = self.parse_date(self.entry_arrival.get())
         
         if not approval or not arrival:
+            self.calc_generation += 1
+            self.eligibility_generation += 1
+            self.calc_future = None
+            self.engine = None
             self.lbl_total.config(text="總離境日數：0")
             self.lbl_past_365.config(text="過去365日離境日數：N/A")
             self.lbl_max_365.config(text="任意365日內最多離境：N/A")
             self.lbl_period.config(text=f"入籍計算期（+1年至+6年）離境日數：N/A")
             self.lbl_final_year.config(text="最後一年離境日數：N/A") 
+            self.lbl_eligible.config(text="最早可申請入籍日：N/A", fg=COLOR_NORMAL)
             return
 
         if arrival < approval:
             messagebox.showwarning("日期錯誤", "到達日必須晚於或等於批核日。")
             return
 
-        trips = []
-        for row in self.rows:
-            start = self.parse_date(row[0].get())
-            end = self.parse_date(row[1].get())
-            if start and end:
-                if end <= start:
-                    messagebox.showwarning("日期錯誤", "回國日必須晚於出國日。")
-                    return
-                activity = row[3].get() if len(row) > 4 and isinstance(row[3], tk.Entry) else "" 
-                trips.append((start, end, activity))
-            elif start or end:
-                messagebox.showwarning("日期錯誤", "出國日和回國日必須同時填寫。")
+        self.start_calculation(approval, arrival, self.collect_trips())
+
+    def start_calculation(self, approval, arrival, trips):
+        # 在背景重建計算引擎；較新的計算會取消仍未開始的舊計算，已完成的舊結果亦會被捨棄
+        self.calc_generation += 1
+        generation = self.calc_generation
+        if self.calc_future:
+            self.calc_future.cancel()
+        started = time.perf_counter()
+
+        def build():
+            from travel_incremental import IncrementalAbsence
+            with stage("calculate.build_engine"):
+                engine = IncrementalAbsence(approval, arrival, trips)
+            with stage("calculate.result"):
+                return engine, engine.result(include_trips=False)
+
+        def done(outcome):
+            if generation != self.calc_generation:
                 return
+            self.calc_future = None
+            self.engine, result = outcome
+            self.show_row_counts(self.rows)
+            self.show_result(result)
+            self.show_timing(self.load_seconds, time.perf_counter() - started)
+            if profiler.enabled:
+                profiler.record("calculate.total", time.perf_counter() - started)
 
-        initial_departure_days = set()
-        current = approval
-        while current < arrival:
-            initial_departure_days.add(current)
-            current += timedelta(days=1)
-        
-        travel_departure_days = set()
-        for start, end, _ in trips:
-            current = start + timedelta(days=1)
-            while current < end:
-                travel_departure_days.add(current)
-                current += timedelta(days=1)
-        
-        all_departure_days = initial_departure_days.union(travel_departure_days)
+        self.calc_future = self.run_async(build, done)
 
-        total_departure_days_count = len(all_departure_days)
-        self.lbl_total.config(text=f"總離境日數：{total_departure_days_count}")
-        
-        for row in self.rows:
-            entry_in = row[1].get()
-            lbl_365_count = row[2]
-            end = self.parse_date(entry_in)
-            
-            if end: 
-                end_of_check = end
-                
-                start_of_check_raw = end_of_check - timedelta(days=365) + timedelta(days=1)
-                
-                start_of_check = max(approval, start_of_check_raw) 
-                
-                count_365 = len([d for d in all_departure_days 
-                                 if start_of_check <= d <= end_of_check])
-                
-                color_fg = COLOR_NORMAL
-                if count_365 > 180:
-                    color_fg = COLOR_RED
-                elif count_365 >= 150:
-                    color_fg = COLOR_ORANGE
-                
-                lbl_365_count.config(text=str(count_365), fg=color_fg)
+    def on_stay_edited(self, event=None):
+        if not self.live_calculation.get():
+            return
+        approval = self.parse_date(self.entry_approval.get())
+        arrival = self.parse_date(self.entry_arrival.get())
+        if not approval or not arrival or arrival < approval:
+            return
+        if self.calc_future is None and self.engine and (self.engine.approval, self.engine.arrival) == (approval, arrival):
+            return
+        self.start_calculation(approval, arrival, self.collect_trips())
+
+    @timed("on_row_edited")
+    def on_row_edited(self, row):
+        self.check_trips()
+        if not self.live_calculation.get():
+            return
+        if self.calc_future is not None:
+            # 背景仍在重建引擎（包括第一次計算時 engine 仍是 None），以最新資料重新計算
+            approval = self.parse_date(self.entry_approval.get())
+            arrival = self.parse_date(self.entry_arrival.get())
+            if approval and arrival and arrival >= approval:
+                self.start_calculation(approval, arrival, self.collect_trips())
+            return
+        if self.engine is None:
+            return
+        key = row.iid
+        start = self.parse_date(row.out_date)
+        end = self.parse_date(row.in_date)
+        if start and end and end > start:
+            affected = self.engine.set_trip(key, start, end)
+        else:
+            affected = self.engine.remove_trip(key) | {key}
+        self.show_row_counts([self.row_by_iid[iid] for iid in affected if iid in self.row_by_iid])
+        self.show_result(self.engine.result(include_trips=False))
+
+    def plan_trip(self):
+        departure = self.parse_date(self.entry_plan_departure.get())
+        if not departure:
+            self.lbl_plan.config(text="請輸入計劃出國日（yyyy-mm-dd）", fg=COLOR_RED)
+            return
+        approval = self.parse_date(self.entry_approval.get())
+        arrival = self.parse_date(self.entry_arrival.get())
+        if not approval or not arrival or arrival < approval:
+            self.lbl_plan.config(text="請先輸入批核日及到達日", fg=COLOR_RED)
+            return
+
+        from travel_planner import TripPlanner
+        planner = TripPlanner(approval, arrival, self.check_trips().merged)
+        plan = planner.latest_return(departure)
+        if plan.unlimited:
+            self.lbl_plan.config(text="此出國日不受任何離境限制", fg=COLOR_NORMAL)
+            return
+
+        rule = DEFAULT_RULE_SET.rule(plan.binding_rule)
+        rule_name = f"{rule.label} {rule.limit}日"
+        latest_str = plan.latest_return.strftime('%Y/%#m/%#d')
+        color_fg = COLOR_RED if plan.absent_days == 0 else COLOR_NORMAL
+        self.lbl_plan.config(text=f"最遲回國日：{latest_str}（可離境 {plan.absent_days} 日，受{rule_name}限制）", fg=color_fg)
+
+    def export_days(self):
+        # 逐日匯出離境狀態及滾動離境日數，在背景串流寫出
+        approval = self.parse_date(self.entry_approval.get())
+        arrival = self.parse_date(self.entry_arrival.get())
+        if not approval or not arrival:
+            messagebox.showwarning("匯出", "請先輸入批核日及到達日。")
+            return
+        report = self.check_trips()
+        if report.errors:
+            messagebox.showwarning("匯出", f"請先修正行程：{report.summary()}")
+            return
+        # 匯出功能較少使用，按下時才載入（可能包括 pyarrow）
+        from tkinter import filedialog
+        from travel_timeline import export_timeline, parquet_available
+        filetypes = [("CSV", "*.csv")] + ([("Parquet", "*.parquet")] if parquet_available else [])
+        path = filedialog.asksaveasfilename(title="匯出逐日離境記錄", defaultextension=".csv", filetypes=filetypes,
+                                            initialfile="bno_timeline.csv")
+        if not path:
+            return
+        trips = report.merged
+        self.run_async(lambda: export_timeline(approval, arrival, trips, path),
+                       lambda count: messagebox.showinfo("匯出完成", f"已匯出 {count} 日的記錄。"))
+
+    @timed("show_row_counts")
+    def show_row_counts(self, rows):
+        for row in rows:
+            if self.engine and row.iid in self.engine.trips: 
+                row.count_365 = self.engine.trip_365_count(row.iid)
             else:
-                lbl_365_count.config(text="-", fg=COLOR_NORMAL)
-        
-        today = datetime.now().date()
-        past_365_start = today - timedelta(days=365)
-        
-        past_365_days_count = len([d for d in all_departure_days 
-                                   if past_365_start <= d < today])
-                                   
-        past_365_remain = 180 - past_365_days_count 
+                row.count_365 = None
+            self.render_row(row)
 
-        past_365_start_str = past_365_start.strftime('%Y/%#m/%#d')
-        today_str = today.strftime('%Y/%#m/%#d')
+    @timed("show_result")
+    def show_result(self, result):
+        self.lbl_total.config(text=f"總離境日數：{result.total_days}")
         
-        self.lbl_past_365.config(text=f"過去365日離境日數（{past_365_start_str}–{today_str}）：{past_365_days_count} 日")
-        self.color_label(self.lbl_past_365, past_365_remain, [50, 30, 10])
+        past_365_start_str = result.past_365_start.strftime('%Y/%#m/%#d')
+        today_str = result.today.strftime('%Y/%#m/%#d')
+        
+        self.lbl_past_365.config(text=f"過去365日離境日數（{past_365_start_str}–{today_str}）：{result.past_365_days} 日")
+        self.color_label(self.lbl_past_365, result.past_365_remain, DEFAULT_RULE_SET.rule("past_365"))
 
         self.max_365_periods = []
-        max_365_count = 0
-        
-        end_of_check_period = approval + relativedelta(years=5) 
-        
-        current_date = approval
-        while current_date < end_of_check_period:
-            start_window = current_date
-            end_window = current_date + timedelta(days=365) - timedelta(days=1)
-            
-            count = len([d for d in all_departure_days if start_window <= d <= end_window])
-            
-            if count >= 150: 
-                period_str = f"{start_window.strftime('%Y/%#m/%#d')}–{end_window.strftime('%Y/%#m/%#d')}"
-                self.max_365_periods.append((count, period_str))
-                
-            if count > max_365_count:
-                max_365_count = count
-                
-            current_date += timedelta(days=1)
-            
-        self.max_365_periods.sort(key=lambda x: x[0], reverse=True)
+        for count, start_window, end_window in result.max_365_periods:
+            period_str = f"{start_window.strftime('%Y/%#m/%#d')}–{end_window.strftime('%Y/%#m/%#d')}"
+            self.max_365_periods.append((count, period_str))
         
+        max_365_count = result.max_365_days
+        remain_max_365 = result.max_365_remain
         display_periods = []
         closest_to_180_count = -1
         closest_period = "N/A"
         
         for count, period in self.max_365_periods:
-            if count > 180:
+            if count > RULE_365.limit:
                 if len(display_periods) < 5: 
-                    display_periods.append(f"{period}：{count}日 (超額 {count - 180} 日)")
+                    display_periods.append(f"{period}：{count}日 (超額 {count - RULE_365.limit} 日)")
             
-            if 180 >= count > closest_to_180_count:
+            if RULE_365.limit >= count > closest_to_180_count:
                 closest_to_180_count = count
                 closest_period = period
         
@@ -473,49 +969,67 @@ class TravelApp:
             result_text = "任意365日內最多離境：\n" + "\n".join(display_periods)
             if closest_to_180_count != -1:
                  result_text += f"\n最接近180日（未超額）：{closest_period}：{closest_to_180_count}日"
-            remain_max_365 = 180 - max_365_count
             result_text += f"\n最高紀錄：{max_365_count}日 (剩餘 {remain_max_365} 日)"
         elif closest_to_180_count != -1:
-            remain_max_365 = 180 - max_365_count
             result_text = f"任意365日內最多離境：\n{closest_period}：{closest_to_180_count}日 (剩餘 {remain_max_365} 日)"
         else:
-            remain_max_365 = 180 - max_365_count
             result_text = f"任意365日內最多離境：{max_365_count}日 (剩餘 {remain_max_365} 日)"
             
         self.lbl_max_365.config(text=result_text)
-        self.color_label(self.lbl_max_365, remain_max_365, [50, 30, 10])
+        self.color_label(self.lbl_max_365, remain_max_365, DEFAULT_RULE_SET.rule("max_365"))
 
-        naturalisation_application_date = approval + relativedelta(years=6)
-        
-        ilr_end = naturalisation_application_date - timedelta(days=1)
-        
-        ilr_start = ilr_end - relativedelta(years=5) + timedelta(days=1) 
+        ilr_start_str = result.ilr_start.strftime('%Y/%#m/%#d')
+        ilr_end_str = result.ilr_end.strftime('%Y/%#m/%#d')
 
-        period_days_count = len([d for d in all_departure_days 
-                                 if ilr_start <= d <= ilr_end])
+        self.lbl_period.config(text=f"入籍計算期（{ilr_start_str}–{ilr_end_str}）離境日數：{result.ilr_days}（剩餘 {result.ilr_remain} 日）")
+        self.color_label(self.lbl_period, result.ilr_remain, DEFAULT_RULE_SET.rule("ilr_period"))
         
-        remain_long = 450 - period_days_count
+        final_year_start_str = result.final_year_start.strftime('%Y/%#m/%#d')
+        final_year_end_str = result.final_year_end.strftime('%Y/%#m/%#d')
         
-        ilr_start_str = ilr_start.strftime('%Y/%#m/%#d')
-        ilr_end_str = ilr_end.strftime('%Y/%#m/%#d')
+        self.lbl_final_year.config(text=f"最後一年離境日數（{final_year_start_str}–{final_year_end_str}）：{result.final_year_days}（剩餘 {result.final_year_remain} 日）")
+        self.color_label(self.lbl_final_year, result.final_year_remain, DEFAULT_RULE_SET.rule("final_year"))
+        self.show_eligibility(result)
 
-        self.lbl_period.config(text=f"入籍計算期（{ilr_start_str}–{ilr_end_str}）離境日數：{period_days_count}（剩餘 {remain_long} 日）")
-        self.color_label(self.lbl_period, remain_long, [120, 60, 30])
-        
-        final_year_end = ilr_end
-        final_year_start = ilr_end - relativedelta(years=1) + timedelta(days=1)
-        
-        final_year_days_count = len([d for d in all_departure_days 
-                                     if final_year_start <= d <= final_year_end])
-        
-        final_year_remain = 90 - final_year_days_count
+    @timed("show_eligibility")
+    def show_eligibility(self, result):
+        # 沒有超額時原定申請日已符合所有限制，毋須搜尋；
+        # 超額時在背景搜尋（每次修改都會觸發），較新的搜尋會取消未開始的舊搜尋，舊結果亦會被捨棄
+        self.eligibility_generation += 1
+        generation = self.eligibility_generation
+        if self.eligibility_future:
+            self.eligibility_future.cancel()
+            self.eligibility_future = None
+        if not result.breaches:
+            date_str = (result.ilr_end + timedelta(days=1)).strftime('%Y/%#m/%#d')
+            margin = min(result.max_365_remain, result.ilr_remain, result.final_year_remain)
+            self.lbl_eligible.config(text=f"最早可申請入籍日：{date_str}（最少剩餘 {margin} 日）", fg=COLOR_NORMAL)
+            return
+        if self.engine is None:
+            return
+        self.lbl_eligible.config(text="最早可申請入籍日：計算中…", fg=COLOR_NORMAL)
+        approval, arrival, trips = result.approval, result.arrival, list(self.engine.trips.values())
 
-        final_year_start_str = final_year_start.strftime('%Y/%#m/%#d')
-        final_year_end_str = final_year_end.strftime('%Y/%#m/%#d')
-        
-        self.lbl_final_year.config(text=f"最後一年離境日數（{final_year_start_str}–{final_year_end_str}）：{final_year_days_count}（剩餘 {final_year_remain} 日）")
-        self.color_label(self.lbl_final_year, final_year_remain, [30, 15, 5])
+        def search():
+            from travel_eligibility import earliest_application
+            with stage("show_eligibility.search"):
+                return earliest_application(approval, arrival, trips)
+
+        def done(eligibility):
+            if generation != self.eligibility_generation:
+                return
+            self.eligibility_future = None
+            self.show_eligibility_result(eligibility)
 
+        self.eligibility_future = self.run_async(search, done)
+
+    def show_eligibility_result(self, eligibility):
+        from travel_eligibility import SEARCH_YEARS
+        if not eligibility.found:
+            self.lbl_eligible.config(text=f"最早可申請入籍日：原定日期起{SEARCH_YEARS}年內沒有符合所有限制的日子", fg=COLOR_RED)
+            return
+        date_str = eligibility.application_date.strftime('%Y/%#m/%#d')
+        self.lbl_eligible.config(text=f"最早可申請入籍日：{date_str}（延後 {eligibility.delay_days} 日，最少剩餘 {eligibility.margin} 日）", fg=COLOR_ORANGE)
 
 if __name__ == "__main__":
     try:
@@ -524,6 +1038,7 @@ if __name__ == "__main__":
     except:
         pass
 
-    root = tk.Tk()
-    app = TravelApp(root)
-    root.mainloop()
+    with session():
+        root = tk.Tk()
+        app = TravelApp(root)
+        root.mainloop()
@@ -0,0 +1,158 @@
+import argparse
+import json
+import sys
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from itertools import accumulate
+
+from dateutil.relativedelta import relativedelta
+
+from travel_calc import TravelDataError, parse_date, read_record, validate_trips
+from travel_engine import AbsenceIndex, stay_intervals
+from travel_rules import ANCHOR_APPLICATION, ANCHOR_ROLLING, DEFAULT_RULE_SET
+
+# 預設由原定申請日起最多向後找多少年
+SEARCH_YEARS = 10
+
+
+@dataclass
+class Eligibility:
+    # application_date 為 None 代表搜尋範圍內沒有符合所有限制的日子
+    application_date: date
+    default_date: date
+    margins: dict = field(default_factory=dict)
+
+    @property
+    def found(self):
+        return self.application_date is not None
+
+    @property
+    def delay_days(self):
+        return (self.application_date - self.default_date).days if self.found else None
+
+    @property
+    def margin(self):
+        # 所有限制中最少的剩餘日數
+        return min(self.margins.values()) if self.margins else None
+
+    def to_dict(self):
+        return {
+            "application_date": self.application_date.isoformat() if self.found else None,
+            "default_date": self.default_date.isoformat(),
+            "delay_days": self.delay_days,
+            "margin": self.margin,
+            "margins": self.margins,
+        }
+
+
+def earliest_application(approval, arrival, trips, rule_set=DEFAULT_RULE_SET, not_before=None,
+                         search_years=SEARCH_YEARS):
+    # 由原定申請日（或 not_before）起逐日移後申請日，回傳第一個所有限制都符合的日子
+    # 申請日移後 k 日時，以申請日為錨點的窗口及任意365日的檢查期亦一同移後 k 日
+    # 先建立每日累計離境日數，之後每個候選日子只需 O(1)（任意365日以單調隊列維持窗口最大值），總共 O(日數)
+    validate_trips(approval, arrival, trips)
+    index = AbsenceIndex(stay_intervals(approval, arrival, trips))
+
+    default_date = rule_set.application_date(approval)
+    first_candidate = max(default_date, not_before or default_date)
+    last_candidate = first_candidate + relativedelta(years=search_years)
+    shift = (first_candidate - default_date).days
+    candidates = (last_candidate - first_candidate).days + 1
+
+    fixed = [rule for rule in rule_set.rules if rule.anchor == ANCHOR_APPLICATION]
+    rolling = [rule for rule in rule_set.rules if rule.anchor == ANCHOR_ROLLING]
+
+    # 每日離境 0/1 及其前綴和，涵蓋所有候選日子需要的窗口
+    starts = [approval.toordinal()]
+    stops = [last_candidate.toordinal()]
+    for rule in fixed:
+        starts.append(rule.window_start(first_candidate - timedelta(days=1)).toordinal())
+    for rule in rolling:
+        starts.append((approval + rule.start).toordinal() + shift)
+        stops.append((approval + rule.until).toordinal() + shift + candidates + rule.window_days)
+    base = min(starts)
+    absent = [0] * (max(stops) - base)
+    for interval in index.intervals:
+        lo, hi = max(interval.start - base, 0), min(interval.end - base, len(absent))
+        if lo < hi:
+            absent[lo:hi] = [1] * (hi - lo)
+    prefix = list(accumulate(absent, initial=0))
+
+    def count(start, stop):
+        # start 至 stop（不包括）的離境日數
+        return prefix[max(stop - base, 0)] - prefix[max(start - base, 0)]
+
+    # 任意365日：每個開始日的窗口總數，以及候選日子對應的開始日範圍 [first, stop)
+    windows = []
+    for rule in rolling:
+        first = (approval + rule.start).toordinal() + shift
+        stop = (approval + rule.until).toordinal() + shift
+        windows.append((rule, first, stop, deque()))
+
+    day = first_candidate
+    for k in range(candidates):
+        margins = {}
+        end = day - timedelta(days=1)
+        for rule in fixed:
+            margins[rule.id] = rule.limit - count(rule.window_start(end).toordinal(), day.toordinal())
+        for rule, first, stop, peaks in windows:
+            # 單調隊列：保存 (開始日, 總數)，總數由大至小
+            if k == 0:
+                starts_to_add = range(first, stop)
+            else:
+                starts_to_add = (stop + k - 1,)
+            for start in starts_to_add:
+                total = count(start, start + rule.window_days)
+                while peaks and peaks[-1][1] <= total:
+                    peaks.pop()
+                peaks.append((start, total))
+            while peaks and peaks[0][0] < first + k:
+                peaks.popleft()
+            margins[rule.id] = rule.limit - (peaks[0][1] if peaks else 0)
+        if all(remain >= 0 for remain in margins.values()):
+            return Eligibility(day, default_date, margins)
+        day += timedelta(days=1)
+    return Eligibility(None, default_date)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m travel_eligibility", description="搜尋符合所有離境限制的最早入籍申請日")
+    parser.add_argument("file", help="bno_travel_data.csv 格式的檔案")
+    parser.add_argument("--not-before", help="不早於此日期 (yyyy-mm-dd)，例如今日")
+    parser.add_argument("--years", type=int, default=SEARCH_YEARS, help="由原定申請日起最多搜尋多少年")
+    parser.add_argument("--json", action="store_true", help="以 JSON 輸出結果")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    not_before = None
+    if args.not_before:
+        not_before = parse_date(args.not_before)
+        if not not_before:
+            print(f"日期格式錯誤：{args.not_before}", file=sys.stderr)
+            return 2
+
+    try:
+        record = read_record(args.file)
+        result = earliest_application(record.approval, record.arrival, record.trips,
+                                      not_before=not_before, search_years=args.years)
+    except (OSError, TravelDataError) as e:
+        print(f"{args.file}: {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        json.dump(result.to_dict(), sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    elif result.found:
+        print(f"最早申請日：{result.application_date}（原定 {result.default_date}，延後 {result.delay_days} 日）")
+        for rule_id, remain in result.margins.items():
+            print(f"  {DEFAULT_RULE_SET.rule(rule_id).label}：剩餘 {remain} 日")
+    else:
+        print(f"{args.years} 年內沒有符合所有限制的申請日")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+from bisect import bisect_right
+from datetime import timedelta
+
+
+class AbsenceInterval:
+    # 一段離境時間，以日數 (date.toordinal) 表示，start 包括在內，end 不包括在內
+    __slots__ = ("start", "end")
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def from_dates(cls, first_day, end_day):
+        # first_day 為第一個離境日，end_day 為回到英國當日（不計算）
+        return cls(first_day.toordinal(), end_day.toordinal())
+
+    def __len__(self):
+        return max(0, self.end - self.start)
+
+    def __eq__(self, other):
+        return isinstance(other, AbsenceInterval) and (self.start, self.end) == (other.start, other.end)
+
+    def __repr__(self):
+        return f"AbsenceInterval({self.start}, {self.end})"
+
+
+def merge_intervals(intervals):
+    # 排序並合併重疊或相連的時段，回傳互不重疊的時段列表
+    merged = []
+    for interval in sorted((i for i in intervals if i.end > i.start), key=lambda i: i.start):
+        if merged and interval.start <= merged[-1].end:
+            if interval.end > merged[-1].end:
+                merged[-1].end = interval.end
+        else:
+            merged.append(AbsenceInterval(interval.start, interval.end))
+    return merged
+
+
+def stay_intervals(approval, arrival, trips):
+    # 批核日至到達日，以及每次出國（首尾兩日不計）的離境時段
+    intervals = [AbsenceInterval.from_dates(approval, arrival)]
+    for start, end, *_ in trips:
+        intervals.append(AbsenceInterval.from_dates(start + timedelta(days=1), end))
+    return intervals
+
+
+class AbsenceIndex:
+    # 合併後的離境時段加上累計日數，每個區間查詢只需 O(log 時段數目)
+
+    def __init__(self, intervals):
+        self.intervals = merge_intervals(intervals)
+        self.starts = [i.start for i in self.intervals]
+        self.cumulative = [0]
+        for interval in self.intervals:
+            self.cumulative.append(self.cumulative[-1] + len(interval))
+
+    def __len__(self):
+        return self.cumulative[-1]
+
+    def days_before(self, ordinal):
+        # ordinal 當日之前（不包括當日）的離境日數
+        pos = bisect_right(self.starts, ordinal) - 1
+        if pos < 0:
+            return 0
+        interval = self.intervals[pos]
+        return self.cumulative[pos] + min(ordinal, interval.end) - interval.start
+
+    def count(self, start, end):
+        # 計算 start 至 end（包括首尾兩日）之間的離境日數
+        if end < start:
+            return 0
+        return self.days_before(end.toordinal() + 1) - self.days_before(start.toordinal())
+
+    def count_before(self, start, end):
+        # 計算 start 至 end（不包括 end 當日）之間的離境日數
+        return self.count(start, end - timedelta(days=1))
+
+    def rolling_counts(self, first_start, last_start, window=365):
+        # 逐日移動 window 日的窗口，回傳 (窗口開始日, 窗口結束日, 離境日數)
+        span = timedelta(days=window - 1)
+        current = first_start
+        while current < last_start:
+            end = current + span
+            yield current, end, self.count(current, end)
+            current += timedelta(days=1)
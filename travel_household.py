@@ -0,0 +1,122 @@
+from dataclasses import dataclass, field
+from datetime import date
+
+from travel_calc import TravelDataError, calculate
+from travel_dates import parse_date
+
+
+@dataclass
+class Member:
+    name: str
+    approval: date = None
+    arrival: date = None
+    trip_keys: set = field(default_factory=set)
+
+
+class Household:
+    # 全家共用一份行程，每個成員只記錄參與了哪些行程（key）
+    # 每個成員的結果會被快取；只有該成員的批核日、到達日或參與的行程改變時才重新計算
+
+    def __init__(self):
+        self.trips = {}
+        self.members = {}
+        self.travellers = {}
+        self._cache = {}
+
+    @classmethod
+    def from_store(cls, store):
+        # 同一行程在多個 profile 中使用相同的 key，載入後只保留一份
+        household = cls()
+        for name in store.profiles():
+            data = store.load(name)
+            if data is None:
+                continue
+            household.set_member(name, parse_date(data.approval), parse_date(data.arrival))
+            for key, out_date, in_date, _ in data.rows:
+                household.set_trip(key, parse_date(out_date), parse_date(in_date), [name])
+        return household
+
+    def _invalidate(self, names):
+        for name in names:
+            self._cache.pop(name, None)
+
+    def set_member(self, name, approval, arrival):
+        member = self.members.get(name)
+        if member is None:
+            self.members[name] = Member(name, approval, arrival)
+        elif (member.approval, member.arrival) != (approval, arrival):
+            member.approval, member.arrival = approval, arrival
+        else:
+            return
+        self._invalidate([name])
+
+    def set_trip(self, key, start, end, members=()):
+        # 新增或修改一個行程並加入 members；未完成（缺日期或回國日不晚於出國日）的行程不計算在內
+        # 回傳需要重新計算的成員
+        trip = (start, end) if start and end and end > start else None
+        travellers = self.travellers.setdefault(key, set())
+        joined = {name for name in members if name not in travellers}
+        for name in joined:
+            travellers.add(name)
+            self.members.setdefault(name, Member(name)).trip_keys.add(key)
+
+        if self.trips.get(key) == trip:
+            changed = joined
+        else:
+            changed = set(travellers)
+        if trip is None:
+            self.trips.pop(key, None)
+        else:
+            self.trips[key] = trip
+        self._invalidate(changed)
+        return changed
+
+    def share_trip(self, key, *names):
+        return self.set_trip(key, *self.trips.get(key, (None, None)), names)
+
+    def unshare_trip(self, key, name):
+        travellers = self.travellers.get(key, set())
+        if name not in travellers:
+            return
+        travellers.discard(name)
+        self.members[name].trip_keys.discard(key)
+        if not travellers:
+            self.travellers.pop(key, None)
+            self.trips.pop(key, None)
+        self._invalidate([name])
+
+    def trips_of(self, name):
+        member = self.members[name]
+        return sorted(self.trips[key] for key in member.trip_keys if key in self.trips)
+
+    def result(self, name, today=None):
+        # 回傳 CalculationResult；未有批核日及到達日時回傳 None，資料錯誤時拋出 TravelDataError
+        today = today or date.today()
+        cached = self._cache.get(name)
+        if cached is not None and cached[0] == today:
+            if isinstance(cached[1], str):
+                raise TravelDataError(cached[1])
+            return cached[1]
+
+        member = self.members[name]
+        if not member.approval or not member.arrival:
+            outcome = None
+        else:
+            try:
+                outcome = calculate(member.approval, member.arrival, self.trips_of(name), today)
+            except TravelDataError as e:
+                # 只快取錯誤訊息，每次重新建立例外
+                self._cache[name] = (today, str(e))
+                raise
+        self._cache[name] = (today, outcome)
+        return outcome
+
+    def summary(self, today=None):
+        # 回傳每個成員的 (名稱, 結果, 錯誤訊息)；只重新計算有改變的成員
+        rows = []
+        for name in self.members:
+            try:
+                rows.append((name, self.result(name, today), ""))
+            except TravelDataError as e:
+                rows.append((name, None, str(e)))
+        return rows
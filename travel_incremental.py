@@ -0,0 +1,170 @@
+from datetime import date, timedelta
+
+from travel_calc import CalculationResult, WARNING_365, WINDOW_365, past_365_window, rule_periods, window_365_start
+
+WINDOW = WINDOW_365
+# 時間軸向外預留的日數，避免每次稍為超出範圍的修改都要重建
+MARGIN = 366
+
+
+class IncrementalAbsence:
+    # 以行為單位（key）記錄出國時段，修改一行時只更新受影響的日子、365日窗口及行
+
+    def __init__(self, approval, arrival, trips=None):
+        self.approval = approval
+        self.arrival = arrival
+        self.trips = dict(trips or {})
+        (self.check_start, self.check_end, self.ilr_start, self.ilr_end,
+         self.final_year_start) = rule_periods(approval)
+        self._rebuild()
+
+    def _span(self, start, end):
+        # 出國時段的離境日子：出國日翌日至回國日前一日
+        return (start + timedelta(days=1)).toordinal(), end.toordinal()
+
+    def _rebuild(self):
+        spans = [(self.approval.toordinal(), self.arrival.toordinal())]
+        spans += [self._span(s, e) for s, e in self.trips.values()]
+        check_last = self.check_end.toordinal() + WINDOW
+        self.base = min([self.approval.toordinal(), self.check_start.toordinal()] + [s for s, e in spans if e > s]) - MARGIN
+        self.limit = max([check_last] + [e for s, e in spans if e > s]) + MARGIN
+
+        size = self.limit - self.base
+        self.coverage = [0] * size
+        self.absent = [0] * size
+        for s, e in spans:
+            for offset in range(s - self.base, e - self.base):
+                self.coverage[offset] += 1
+                self.absent[offset] = 1
+
+        # Fenwick tree：離境日數的前綴和
+        self.tree = [0] * (size + 1)
+        for i, flag in enumerate(self.absent, start=1):
+            self.tree[i] += flag
+            parent = i + (i & -i)
+            if parent <= size:
+                self.tree[parent] += self.tree[i]
+
+        # totals[i] 為由檢查期第 i 日開始的365日窗口離境日數
+        prefix = [0]
+        for flag in self.absent:
+            prefix.append(prefix[-1] + flag)
+        self.window_base = self.check_start.toordinal()
+        first = self.window_base - self.base
+        self.totals = [prefix[i + WINDOW] - prefix[i]
+                       for i in range(first, self.check_end.toordinal() - self.base)]
+
+    def _add(self, offset, delta):
+        i = offset + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, ordinal):
+        # ordinal 當日之前的離境日數
+        i = min(max(ordinal - self.base, 0), self.limit - self.base)
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def _range(self, start, end):
+        return self._prefix(end) - self._prefix(start)
+
+    def _cover(self, start, end, delta):
+        # 為 start 至 end（不包括）的日子加減覆蓋次數，回傳離境狀態有改變的日子範圍
+        changed = None
+        for ordinal in range(start, end):
+            offset = ordinal - self.base
+            before = self.coverage[offset] > 0
+            self.coverage[offset] += delta
+            after = self.coverage[offset] > 0
+            if before == after:
+                continue
+            flag = 1 if after else -1
+            self.absent[offset] = int(after)
+            self._add(offset, flag)
+            first = max(ordinal - WINDOW + 1 - self.window_base, 0)
+            last = min(ordinal - self.window_base + 1, len(self.totals))
+            for i in range(first, last):
+                self.totals[i] += flag
+            changed = (ordinal, ordinal) if changed is None else (changed[0], ordinal)
+        return changed
+
+    def _affected(self, changed):
+        # 回國日的365日窗口與改變的日子重疊的行
+        if changed is None:
+            return set()
+        lo, hi = changed
+        return {key for key, (_, end) in self.trips.items()
+                if end.toordinal() >= lo and end.toordinal() - WINDOW < hi}
+
+    def set_trip(self, key, start, end):
+        # 新增或修改一行，回傳需要更新365日標籤的行
+        old = self.trips.get(key)
+        if old == (start, end):
+            return set()
+        new_span = self._span(start, end)
+        if new_span[0] < new_span[1] and (new_span[0] < self.base or new_span[1] > self.limit):
+            self.trips[key] = (start, end)
+            self._rebuild()
+            return set(self.trips)
+
+        changed = []
+        if old:
+            changed.append(self._cover(*self._span(*old), -1))
+        self.trips[key] = (start, end)
+        changed.append(self._cover(*new_span, 1))
+        return self._affected(self._merge_changed(changed)) | {key}
+
+    def remove_trip(self, key):
+        old = self.trips.pop(key, None)
+        if old is None:
+            return set()
+        return self._affected(self._cover(*self._span(*old), -1))
+
+    def _merge_changed(self, changed):
+        changed = [c for c in changed if c is not None]
+        if not changed:
+            return None
+        return min(c[0] for c in changed), max(c[1] for c in changed)
+
+    def count(self, start, end):
+        # start 至 end（包括首尾兩日）的離境日數
+        if end < start:
+            return 0
+        return self._range(start.toordinal(), end.toordinal() + 1)
+
+    def trip_365_count(self, key):
+        end = self.trips[key][1]
+        return self.count(window_365_start(self.approval, end), end)
+
+    def result(self, today=None, include_trips=True):
+        today = today or date.today()
+        past_365_start, past_365_end = past_365_window(today)
+
+        max_365_periods = []
+        for offset, count in enumerate(self.totals):
+            if count >= WARNING_365:
+                first = self.check_start + timedelta(days=offset)
+                max_365_periods.append((count, first, first + timedelta(days=WINDOW - 1)))
+        max_365_periods.sort(key=lambda x: x[0], reverse=True)
+
+        return CalculationResult(
+            approval=self.approval,
+            arrival=self.arrival,
+            today=today,
+            total_days=self._prefix(self.limit),
+            trip_365_counts=[self.trip_365_count(key) for key in self.trips] if include_trips else [],
+            past_365_start=past_365_start,
+            past_365_days=self.count(past_365_start, past_365_end),
+            max_365_days=max(self.totals, default=0),
+            max_365_periods=max_365_periods,
+            ilr_start=self.ilr_start,
+            ilr_end=self.ilr_end,
+            ilr_days=self.count(self.ilr_start, self.ilr_end),
+            final_year_start=self.final_year_start,
+            final_year_end=self.ilr_end,
+            final_year_days=self.count(self.final_year_start, self.ilr_end),
+        )
@@ -0,0 +1,115 @@
+from dataclasses import dataclass, field
+
+from travel_dates import date_error, parse_date
+
+# 問題類別；ERROR_KINDS 的行不能計算，會被略過
+ISSUE_FORMAT = "format"
+ISSUE_MISSING = "missing"
+ISSUE_INVERTED = "inverted"
+ISSUE_DUPLICATE = "duplicate"
+ISSUE_OVERLAP = "overlap"
+ERROR_KINDS = (ISSUE_FORMAT, ISSUE_MISSING, ISSUE_INVERTED)
+
+SUMMARY_LABELS = {
+    ISSUE_FORMAT: "日期錯誤",
+    ISSUE_MISSING: "只填了一邊",
+    ISSUE_INVERTED: "回國日不晚於出國日",
+    ISSUE_DUPLICATE: "重複",
+    ISSUE_OVERLAP: "與其他行程重疊",
+}
+
+
+@dataclass
+class TripIssue:
+    kind: str
+    ref: object
+    line: int
+    message: str
+    other: object = None
+
+    @property
+    def is_error(self):
+        return self.kind in ERROR_KINDS
+
+    def __str__(self):
+        return f"第 {self.line} 行：{self.message}"
+
+
+@dataclass
+class TripReport:
+    # trips：{ref: (出國日, 回國日)}，只包括可計算的行（重疊及重複的行仍然保留）
+    # merged：按出國日排列並合併重疊行程後的 (出國日, 回國日)，離境日子與 trips 完全相同
+    trips: dict = field(default_factory=dict)
+    merged: list = field(default_factory=list)
+    issues: list = field(default_factory=list)
+
+    @property
+    def errors(self):
+        return [issue for issue in self.issues if issue.is_error]
+
+    @property
+    def warnings(self):
+        return [issue for issue in self.issues if not issue.is_error]
+
+    def summary(self):
+        # 例如「2 行日期錯誤（已略過）；1 行與其他行程重疊」
+        def describe(issues):
+            counts = {}
+            for issue in issues:
+                counts[issue.kind] = counts.get(issue.kind, 0) + 1
+            return "、".join(f"{count} 行{SUMMARY_LABELS[kind]}" for kind, count in counts.items())
+
+        parts = []
+        if self.errors:
+            parts.append(describe(self.errors) + "（已略過）")
+        if self.warnings:
+            parts.append(describe(self.warnings))
+        return "；".join(parts)
+
+
+def normalize_trips(rows, first_line=1):
+    # rows 為 (ref, 出國日文字, 回國日文字)；兩邊都空白的行略過
+    # 先逐行檢查日期，再按 (出國日, 回國日) 排序掃描一次，找出所有重複及重疊的行，共 O(n log n)
+    report = TripReport()
+    valid = []
+    for line, (ref, out_text, in_text) in enumerate(rows, start=first_line):
+        out_text, in_text = (out_text or "").strip(), (in_text or "").strip()
+        if not out_text and not in_text:
+            continue
+        if not out_text or not in_text:
+            report.issues.append(TripIssue(ISSUE_MISSING, ref, line, "出國日和回國日必須同時填寫。"))
+            continue
+        start, end = parse_date(out_text), parse_date(in_text)
+        if not start or not end:
+            report.issues.append(TripIssue(ISSUE_FORMAT, ref, line, f"{date_error(out_text) or date_error(in_text)}。"))
+            continue
+        if end <= start:
+            report.issues.append(TripIssue(ISSUE_INVERTED, ref, line, "回國日必須晚於出國日。"))
+            continue
+        report.trips[ref] = (start, end)
+        valid.append((start, end, line, ref))
+
+    valid.sort()
+    group = None   # 上一組相同日期行程的第一行
+    reach = None   # 目前為止最遲回國的行程
+    for start, end, line, ref in valid:
+        if group and (group[0], group[1]) == (start, end):
+            report.issues.append(TripIssue(ISSUE_DUPLICATE, ref, line, f"與第 {group[2]} 行重複。", group[3]))
+        else:
+            group = (start, end, line, ref)
+            if reach and start < reach[1]:
+                report.issues.append(TripIssue(
+                    ISSUE_OVERLAP, ref, line,
+                    f"與第 {reach[2]} 行重疊（{start}–{min(end, reach[1])}）。", reach[3]))
+        if reach is None or end > reach[1]:
+            reach = (start, end, line, ref)
+
+        # 出國日早於上一段回國日才合併；同日回國再出國的兩段不合併（當日不算離境）
+        if report.merged and start < report.merged[-1][1]:
+            if end > report.merged[-1][1]:
+                report.merged[-1] = (report.merged[-1][0], end)
+        else:
+            report.merged.append((start, end))
+
+    report.issues.sort(key=lambda issue: issue.line)
+    return report
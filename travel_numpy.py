@@ -0,0 +1,76 @@
+import importlib.util
+from datetime import timedelta
+
+# numpy 載入約需0.1秒，視窗程式啟動時用不到，第一次計算時才 import
+np = None
+available = importlib.util.find_spec("numpy") is not None
+
+
+def load_numpy():
+    # 回傳 numpy 模組（第一次呼叫時才 import）；呼叫前應先檢查 available
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+class RollingTimeline:
+    # start 起每日一格：absent 為 0/1 離境陣列，totals[i] 為由第 i 日開始的 window 日內離境日數
+
+    def __init__(self, start, absent, totals, window):
+        self.start = start
+        self.absent = absent
+        self.totals = totals
+        self.window = window
+
+    def window_dates(self, offset):
+        first = self.start + timedelta(days=int(offset))
+        return first, first + timedelta(days=self.window - 1)
+
+    def peak(self):
+        # 回傳 (最高離境日數, 窗口開始日, 窗口結束日)
+        if not len(self.totals):
+            return 0, None, None
+        offset = int(self.totals.argmax())
+        return (int(self.totals[offset]), *self.window_dates(offset))
+
+    def windows_at_least(self, threshold):
+        # 回傳所有離境日數 >= threshold 的窗口 (日數, 開始日, 結束日)
+        offsets = np.flatnonzero(self.totals >= threshold)
+        return [(int(self.totals[o]), *self.window_dates(o)) for o in offsets]
+
+    def breach_intervals(self, limit):
+        # 把連續超過 limit 的窗口開始日合併為 (第一個開始日, 最後一個開始日, 最高日數)
+        over = np.concatenate(([False], self.totals > limit, [False]))
+        edges = np.flatnonzero(np.diff(over.astype(np.int8)))
+        runs = []
+        for first, stop in zip(edges[::2], edges[1::2]):
+            runs.append((
+                self.start + timedelta(days=int(first)),
+                self.start + timedelta(days=int(stop) - 1),
+                int(self.totals[first:stop].max()),
+            ))
+        return runs
+
+
+def absence_array(absence_index, start, end):
+    # start 至 end（不包括 end 當日）每日是否離境的 0/1 陣列
+    load_numpy()
+    base = start.toordinal()
+    absent = np.zeros(max(0, end.toordinal() - base), dtype=np.int8)
+    for interval in absence_index.intervals:
+        lo = max(interval.start - base, 0)
+        hi = min(interval.end - base, len(absent))
+        if lo < hi:
+            absent[lo:hi] = 1
+    return absent
+
+
+def rolling_timeline(absence_index, first_start, last_start, window=365):
+    # 一次過計算 first_start 至 last_start（不包括）之間每個開始日的 window 日離境總數
+    horizon = last_start + timedelta(days=window - 1)
+    absent = absence_array(absence_index, first_start, horizon)
+    cumulative = np.concatenate(([0], np.cumsum(absent, dtype=np.int32)))
+    totals = cumulative[window:] - cumulative[:-window]
+    return RollingTimeline(first_start, absent, totals, window)
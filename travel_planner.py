@@ -0,0 +1,111 @@
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import date
+
+from travel_calc import RULE_365, RULE_FINAL_YEAR, RULE_ILR_PERIOD, WINDOW_365, rule_periods
+from travel_engine import AbsenceIndex, stay_intervals
+
+WINDOW = WINDOW_365
+
+
+@dataclass
+class PlanResult:
+    departure: date
+    latest_return: date
+    absent_days: int
+    binding_rule: str   # 構成限制的規則 id
+
+    @property
+    def unlimited(self):
+        return self.latest_return is None
+
+
+class TripPlanner:
+    # 預先計算每日的累計離境／留英日數，之後每個查詢只需逐個受影響的窗口做一次 bisect
+
+    def __init__(self, approval, arrival, trips):
+        self.approval = approval
+        index = AbsenceIndex(stay_intervals(approval, arrival, trips))
+        check_start, check_end, ilr_start, ilr_end, final_year_start = rule_periods(approval)
+
+        self.base = min([approval.toordinal(), check_start.toordinal()] + index.starts)
+        self.limit = max(check_end.toordinal() + WINDOW, ilr_end.toordinal() + 1,
+                         index.intervals[-1].end if index.intervals else 0)
+        # free[i] 為 base + i 當日之前留在英國（非離境）的日數
+        self.free = [i - index.days_before(self.base + i)
+                     for i in range(self.limit - self.base + 1)]
+
+        self.rolling = (check_start.toordinal(), check_end.toordinal())
+        # totals[i] 為由檢查期第 i 日開始的365日窗口已有的離境日數
+        first = self.rolling[0] - self.base
+        self.totals = [WINDOW - (self.free[i + WINDOW] - self.free[i])
+                       for i in range(first, self.rolling[1] - self.base)]
+        self.fixed_windows = [
+            (ilr_start.toordinal(), ilr_end.toordinal(), RULE_ILR_PERIOD.limit, RULE_ILR_PERIOD.id),
+            (final_year_start.toordinal(), ilr_end.toordinal(), RULE_FINAL_YEAR.limit, RULE_FINAL_YEAR.id),
+        ]
+
+    def _free_before(self, ordinal):
+        offset = ordinal - self.base
+        if offset <= 0:
+            return offset
+        if offset >= len(self.free):
+            return self.free[-1] + offset - len(self.free) + 1
+        return self.free[offset]
+
+    def _absent(self, start, end):
+        # start 至 end（包括首尾兩日）已有的離境日數
+        return (end + 1 - start) - (self._free_before(end + 1) - self._free_before(start))
+
+    def _nth_free_day(self, first, n):
+        # 由 first 起計第 n 個留英日子
+        target = self._free_before(first) + n
+        i = bisect_left(self.free, target, lo=max(first - self.base, 0))
+        if i < len(self.free):
+            return self.base + i - 1
+        return self.limit + target - self.free[-1] - 1
+
+    def _window_cap(self, window_start, window_end, limit, first_day):
+        # 回傳此窗口容許的最遲回國日，None 代表此窗口不構成限制
+        first = max(window_start, first_day)
+        if first > window_end:
+            return None
+        slack = limit - self._absent(window_start, window_end)
+        if slack < 0:
+            return first
+        if self._free_before(window_end + 1) - self._free_before(first) <= slack:
+            return None
+        return self._nth_free_day(first, slack + 1)
+
+    def latest_return(self, departure):
+        # 在 departure 出國，回傳不超過任何限制的最遲回國日
+        first_day = departure.toordinal() + 1
+        latest, rule = None, ""
+
+        for window_start, window_end, limit, name in self.fixed_windows:
+            cap = self._window_cap(window_start, window_end, limit, first_day)
+            if cap is not None and (latest is None or cap < latest):
+                latest, rule = cap, name
+
+        # 任意365日窗口都在時間軸範圍內，直接以列表取值
+        rolling_first, rolling_stop = self.rolling
+        free, base, totals = self.free, self.base, self.totals
+        for window_start in range(max(rolling_first, first_day - WINDOW + 1), rolling_stop):
+            if latest is not None and window_start >= latest:
+                break
+            first = max(window_start, first_day)
+            slack = RULE_365.limit - totals[window_start - rolling_first]
+            if slack < 0:
+                cap = first
+            elif free[window_start + WINDOW - base] - free[first - base] <= slack:
+                continue
+            else:
+                cap = self._nth_free_day(first, slack + 1)
+            if latest is None or cap < latest:
+                latest, rule = cap, RULE_365.id
+
+        if latest is None:
+            return PlanResult(departure, None, 0, "")
+        latest = max(latest, first_day)
+        absent_days = self._free_before(latest) - self._free_before(first_day)
+        return PlanResult(departure, date.fromordinal(latest), absent_days, rule)
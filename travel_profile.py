@@ -0,0 +1,166 @@
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# BNO_PROFILE=1（或 log）：記錄每個階段的時間，並以每行一個 JSON 寫入 BNO_PROFILE_LOG
+# BNO_PROFILE=cprofile：另外以 cProfile 記錄主執行緒及以 profiled() 包住的背景工作，結束時合併寫入 BNO_PROFILE_OUT
+# （cProfile 及 pstats 只在此模式下才 import）
+MODE = os.environ.get("BNO_PROFILE", "").strip().lower()
+LOG_PATH = os.environ.get("BNO_PROFILE_LOG", "bno_profile.jsonl")
+PROFILE_PATH = os.environ.get("BNO_PROFILE_OUT", "bno_profile.prof")
+
+
+class _NullStage:
+    # 關閉時所有階段共用此物件，不做任何計時
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "started")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class Profiler:
+    # 以 with profiler.stage("名稱"): 計時；未啟用時只回傳 NULL_STAGE
+
+    def __init__(self, enabled=False, log_path=None):
+        self.enabled = enabled
+        self.log_path = log_path
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._log = None
+
+    def stage(self, name):
+        if not self.enabled:
+            return NULL_STAGE
+        return _Stage(self, name)
+
+    def record(self, name, seconds):
+        with self._lock:
+            count, total, _, worst = self.stats.get(name, (0, 0.0, 0.0, 0.0))
+            self.stats[name] = (count + 1, total + seconds, seconds, max(worst, seconds))
+            if self.log_path:
+                import json
+                if self._log is None:
+                    self._log = open(self.log_path, "a", encoding="utf-8")
+                self._log.write(json.dumps({
+                    "time": round(time.time(), 3),
+                    "stage": name,
+                    "ms": round(seconds * 1000, 3),
+                    "thread": threading.current_thread().name,
+                }) + "\n")
+                self._log.flush()
+
+    def snapshot(self):
+        # 回傳 [(名稱, 次數, 最近一次秒數, 平均秒數, 最長秒數)]，按名稱排列
+        with self._lock:
+            return [(name, count, last, total / count, worst)
+                    for name, (count, total, last, worst) in sorted(self.stats.items())]
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+
+    def close(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+
+profiler = Profiler(enabled=MODE in ("1", "log", "cprofile"), log_path=LOG_PATH if MODE else None)
+
+
+def stage(name):
+    return profiler.stage(name)
+
+
+def timed(name):
+    # 方法層級的計時；程式啟動時未啟用的話直接回傳原函數，完全沒有額外開銷
+    def decorate(func):
+        if not profiler.enabled:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Stage(profiler, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# 各背景執行緒各自的 cProfile（cProfile 只記錄啟用它的執行緒），session 結束時合併
+_thread_profiles = []
+_thread_profiles_lock = threading.Lock()
+_local = threading.local()
+
+
+def profiled(func):
+    # 包住要在背景執行緒執行的工作；BNO_PROFILE=cprofile 以外直接回傳原函數
+    if MODE != "cprofile":
+        return func
+
+    import cProfile
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        cprofile = getattr(_local, "cprofile", None)
+        if cprofile is None:
+            cprofile = _local.cprofile = cProfile.Profile()
+            with _thread_profiles_lock:
+                _thread_profiles.append(cprofile)
+        try:
+            cprofile.enable()
+        except ValueError:
+            # Python 3.12 起 cProfile 以 sys.monitoring 實作，主執行緒的 cProfile 已包括所有執行緒
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            cprofile.disable()
+    return wrapper
+
+
+@contextmanager
+def session():
+    # 包住整個程式；BNO_PROFILE=cprofile 時於結束後寫出 cProfile 結果（可用 snakeviz 或 pstats 查看）
+    if MODE != "cprofile":
+        try:
+            yield
+        finally:
+            profiler.close()
+        return
+    import cProfile
+    import pstats
+    cprofile = cProfile.Profile()
+    cprofile.enable()
+    try:
+        yield
+    finally:
+        cprofile.disable()
+        stats = pstats.Stats(cprofile)
+        with _thread_profiles_lock:
+            for thread_profile in _thread_profiles:
+                stats.add(thread_profile)
+        stats.dump_stats(PROFILE_PATH)
+        profiler.close()
@@ -0,0 +1,280 @@
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
+
+import travel_numpy
+
+# 窗口的定位方式
+ANCHOR_ROLLING = "rolling"          # 由批核日 + from 至批核日 + until（不包括）每日開始一個窗口，取最高值
+ANCHOR_APPLICATION = "application"  # 以申請日前一日為結束日的單一窗口
+ANCHOR_TODAY = "today"              # 以今日前一日為結束日的單一窗口
+ANCHORS = (ANCHOR_ROLLING, ANCHOR_APPLICATION, ANCHOR_TODAY)
+
+OFFSET_KEYS = ("years", "months", "days")
+
+# 規則集格式（可存為 JSON）：
+#   application：申請日相對批核日的時間
+#   rules[].window：窗口長度；rolling 窗口只可以日數表示
+#   rules[].limit：容許的離境日數上限
+#   rules[].warn：剩餘日數的警告級別（由寬至嚴），用於顯示顏色
+#   rules[].report：rolling 窗口離境日數達此數目時列出該窗口
+BNO = {
+    "name": "bno",
+    "label": "BNO 永居及入籍",
+    "application": {"years": 6},
+    "rules": [
+        {"id": "past_365", "label": "過去365日", "anchor": "today", "window": {"days": 365},
+         "limit": 180, "warn": [50, 30, 10]},
+        {"id": "max_365", "label": "任意365日", "anchor": "rolling", "window": {"days": 365},
+         "from": {"years": 0}, "until": {"years": 5}, "limit": 180, "report": 150, "warn": [50, 30, 10]},
+        {"id": "ilr_period", "label": "入籍計算期", "anchor": "application", "window": {"years": 5},
+         "limit": 450, "warn": [120, 60, 30]},
+        {"id": "final_year", "label": "最後一年", "anchor": "application", "window": {"years": 1},
+         "limit": 90, "warn": [30, 15, 5]},
+    ],
+}
+
+BNO_ILR = {
+    "name": "bno_ilr",
+    "label": "BNO 永居（批核後5年）",
+    "application": {"years": 5},
+    "rules": [rule for rule in BNO["rules"] if rule["id"] in ("past_365", "max_365")],
+}
+
+NATURALISATION = {
+    "name": "naturalisation",
+    "label": "入籍（永居後1年申請）",
+    "application": {"years": 6},
+    "rules": [rule for rule in BNO["rules"] if rule["id"] in ("ilr_period", "final_year")],
+}
+
+
+class RuleSetError(ValueError):
+    pass
+
+
+def _offset(spec, where):
+    if not isinstance(spec, dict) or not spec or set(spec) - set(OFFSET_KEYS):
+        raise RuleSetError(f"{where}：須為包含 years／months／days 的物件。")
+    if not all(isinstance(value, int) for value in spec.values()):
+        raise RuleSetError(f"{where}：years／months／days 必須是整數。")
+    return relativedelta(**spec)
+
+
+def _years_before(day, years):
+    # 與 day - relativedelta(years=years) 相同（2月29日變為2月28日），但快得多
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+
+@dataclass
+class Rule:
+    id: str
+    label: str
+    anchor: str
+    limit: int
+    window: relativedelta
+    window_days: int = None
+    window_years: int = None
+    start: relativedelta = None
+    until: relativedelta = None
+    report: int = None
+    warn: tuple = ()
+
+    def window_start(self, end):
+        # 以 end 為結束日（包括當日）的窗口開始日
+        if self.window_days is not None:
+            return end - timedelta(days=self.window_days - 1)
+        if self.window_years is not None:
+            return _years_before(end, self.window_years) + timedelta(days=1)
+        return end - self.window + timedelta(days=1)
+
+    def level(self, remain):
+        # 0 為正常；剩餘日數每低於一個警告級別加一，超額時為最高級別
+        if remain < 0:
+            return len(self.warn)
+        return sum(1 for band in self.warn if remain <= band)
+
+
+@dataclass
+class RuleSet:
+    name: str
+    label: str
+    application: relativedelta
+    rules: list = field(default_factory=list)
+
+    def rule(self, rule_id):
+        for rule in self.rules:
+            if rule.id == rule_id:
+                return rule
+        raise KeyError(rule_id)
+
+    def application_date(self, approval):
+        return approval + self.application
+
+
+def compile_rule(spec, where):
+    if not isinstance(spec, dict):
+        raise RuleSetError(f"{where}：規則必須是物件。")
+    rule_id = spec.get("id")
+    if not rule_id:
+        raise RuleSetError(f"{where}：缺少 id。")
+    where = f"{where} {rule_id}"
+    anchor = spec.get("anchor")
+    if anchor not in ANCHORS:
+        raise RuleSetError(f"{where}：anchor 必須是 {'、'.join(ANCHORS)} 其中之一。")
+    limit = spec.get("limit")
+    if not isinstance(limit, int) or limit < 0:
+        raise RuleSetError(f"{where}：limit 必須是非負整數。")
+
+    window = _offset(spec.get("window"), f"{where} window")
+    window_days = spec["window"]["days"] if set(spec["window"]) == {"days"} else None
+    window_years = spec["window"]["years"] if set(spec["window"]) == {"years"} else None
+    if window_days is not None and window_days <= 0:
+        raise RuleSetError(f"{where}：window 必須大於0日。")
+    if anchor in (ANCHOR_ROLLING, ANCHOR_TODAY) and window_days is None:
+        raise RuleSetError(f"{where}：{anchor} 窗口只可以日數表示。")
+
+    warn = spec.get("warn", [])
+    if not isinstance(warn, list) or not all(isinstance(band, int) for band in warn):
+        raise RuleSetError(f"{where}：warn 必須是整數列表。")
+
+    rule = Rule(rule_id, spec.get("label", rule_id), anchor, limit, window, window_days, window_years,
+                warn=tuple(sorted(warn, reverse=True)), report=spec.get("report"))
+    if anchor == ANCHOR_ROLLING:
+        rule.start = _offset(spec.get("from", {"days": 0}), f"{where} from")
+        rule.until = _offset(spec.get("until"), f"{where} until")
+    return rule
+
+
+def compile_rule_set(spec):
+    # 把規則集（dict）驗證並轉換為 RuleSet；每個規則集只需編譯一次
+    if not isinstance(spec, dict) or not spec.get("name"):
+        raise RuleSetError("規則集缺少 name。")
+    name = spec["name"]
+    rules = spec.get("rules")
+    if not isinstance(rules, list) or not rules:
+        raise RuleSetError(f"{name}：rules 必須是非空列表。")
+    compiled = [compile_rule(rule, name) for rule in rules]
+    ids = [rule.id for rule in compiled]
+    if len(set(ids)) != len(ids):
+        raise RuleSetError(f"{name}：規則 id 重覆。")
+    return RuleSet(name, spec.get("label", name), _offset(spec.get("application"), f"{name} application"), compiled)
+
+
+def load_rule_sets(path):
+    # JSON 檔案可包含一個規則集或規則集列表（只有 --rules 會用到，所以 json 在此才 import）
+    import json
+    with open(path, encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError as e:
+            raise RuleSetError(f"{path}：{e}") from None
+    return [compile_rule_set(spec) for spec in (data if isinstance(data, list) else [data])]
+
+
+RULE_SETS = {rule_set.name: rule_set for rule_set in map(compile_rule_set, (BNO, BNO_ILR, NATURALISATION))}
+DEFAULT_RULE_SET = RULE_SETS["bno"]
+
+
+@dataclass
+class RuleResult:
+    rule: Rule
+    days: int
+    start: object
+    end: object
+    # rolling 規則：離境日數達 report 的窗口 (日數, 開始日, 結束日)，由多至少排列
+    periods: list = field(default_factory=list)
+
+    @property
+    def remain(self):
+        return self.rule.limit - self.days
+
+    @property
+    def breached(self):
+        return self.days > self.rule.limit
+
+
+@dataclass
+class RuleSetResult:
+    rule_set: RuleSet
+    application_date: object
+    results: dict = field(default_factory=dict)
+
+    def __getitem__(self, rule_id):
+        return self.results[rule_id]
+
+    @property
+    def breaches(self):
+        return [rule_id for rule_id, result in self.results.items() if result.breached]
+
+    def to_dict(self):
+        return {
+            "rule_set": self.rule_set.name,
+            "application_date": self.application_date.isoformat(),
+            "rules": {
+                rule_id: {
+                    "days": result.days,
+                    "limit": result.rule.limit,
+                    "remain": result.remain,
+                    "start": result.start.isoformat() if result.start else None,
+                    "end": result.end.isoformat() if result.end else None,
+                }
+                for rule_id, result in self.results.items()
+            },
+            "breaches": self.breaches,
+        }
+
+
+def _rolling(index, first, last, window, report):
+    # 回傳 (最高離境日數, 窗口開始日, 窗口結束日, [達 report 的窗口])
+    if travel_numpy.available:
+        timeline = travel_numpy.rolling_timeline(index, first, last, window)
+        periods = timeline.windows_at_least(report) if report is not None else []
+        return (*timeline.peak(), periods)
+
+    peak, peak_start, peak_end, periods = 0, None, None, []
+    for start, end, count in index.rolling_counts(first, last, window):
+        if report is not None and count >= report:
+            periods.append((count, start, end))
+        if count > peak or peak_start is None:
+            peak, peak_start, peak_end = count, start, end
+    return peak, peak_start, peak_end, periods
+
+
+def evaluate(index, approval, rule_sets, today):
+    # 在同一個 AbsenceIndex 上計算多個規則集；相同的窗口（例如多個規則集共用的任意365日）只計算一次
+    plan = []
+    rolling = {}
+    for rule_set in rule_sets:
+        application = rule_set.application_date(approval)
+        for rule in rule_set.rules:
+            if rule.anchor == ANCHOR_ROLLING:
+                key = (approval + rule.start, approval + rule.until, rule.window_days)
+                reports = [r for r in (rolling.get(key), rule.report) if r is not None]
+                rolling[key] = min(reports) if reports else None
+            else:
+                end = (application if rule.anchor == ANCHOR_APPLICATION else today) - timedelta(days=1)
+                key = (rule.window_start(end), end)
+            plan.append((rule_set, application, rule, key))
+
+    rolling_results = {key: _rolling(index, *key, report) for key, report in rolling.items()}
+    counts = {}
+    results = {}
+    for rule_set, application, rule, key in plan:
+        if rule_set.name not in results:
+            results[rule_set.name] = RuleSetResult(rule_set, application)
+        if rule.anchor == ANCHOR_ROLLING:
+            peak, start, end, periods = rolling_results[key]
+            periods = sorted((p for p in periods if rule.report is not None and p[0] >= rule.report),
+                             key=lambda p: p[0], reverse=True)
+            result = RuleResult(rule, peak, start, end, periods)
+        else:
+            if key not in counts:
+                counts[key] = index.count(*key)
+            result = RuleResult(rule, counts[key], *key)
+        results[rule_set.name].results[rule.id] = result
+    return [results[rule_set.name] for rule_set in rule_sets]
@@ -0,0 +1,229 @@
+import argparse
+import json
+import sys
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+import travel_numpy
+import travel_rules
+from travel_calc import TravelDataError, parse_date, read_record, validate_trips
+from travel_engine import AbsenceIndex, stay_intervals
+from travel_rules import ANCHOR_APPLICATION, ANCHOR_ROLLING, DEFAULT_RULE_SET, RuleResult, RuleSetResult
+
+
+@dataclass
+class Scenario:
+    # 相對基本記錄的改動：add 為新增的 (出國日, 回國日)，remove 為刪除的行程 key，shift 為 {key: 移後日數}
+    name: str
+    add: list = field(default_factory=list)
+    remove: list = field(default_factory=list)
+    shift: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data, index):
+        # JSON 格式：{"name": ..., "add": [["yyyy-mm-dd", "yyyy-mm-dd"]], "remove": [行程編號], "shift": {"行程編號": 日數}}
+        name = data.get("name") or f"scenario {index + 1}"
+        add = []
+        for out_text, in_text in data.get("add", []):
+            start, end = parse_date(out_text), parse_date(in_text)
+            if not start or not end:
+                raise TravelDataError(f"{name}：日期格式錯誤：{out_text}, {in_text}")
+            add.append((start, end))
+        shift = {int(key): int(days) for key, days in data.get("shift", {}).items()}
+        return cls(name, add, [int(key) for key in data.get("remove", [])], shift)
+
+
+@dataclass
+class ScenarioResult:
+    scenario: Scenario
+    rules: RuleSetResult
+
+    @property
+    def breaches(self):
+        return self.rules.breaches
+
+    @property
+    def worst(self):
+        # 剩餘日數最少（超額最多）的規則及其窗口
+        return min(self.rules.results.values(), key=lambda result: result.remain)
+
+    def to_dict(self):
+        worst = self.worst
+        return {
+            "scenario": self.scenario.name,
+            **self.rules.to_dict(),
+            "worst": {"rule": worst.rule.id, "days": worst.days, "remain": worst.remain,
+                      "start": worst.start.isoformat() if worst.start else None,
+                      "end": worst.end.isoformat() if worst.end else None},
+        }
+
+
+class ScenarioBatch:
+    # 基本記錄的每日覆蓋次數只計算一次；每個情境只以差分陣列記錄改動，
+    # 有 numpy 時所有情境疊成一個矩陣，一次過以 cumsum 計算每日離境及所有窗口
+
+    def __init__(self, approval, arrival, trips, rule_set=DEFAULT_RULE_SET, today=None):
+        # trips 為 {key: (出國日, 回國日[, 活動])} 或列表（key 為由 0 起的編號）
+        self.approval = approval
+        self.arrival = arrival
+        self.trips = {key: tuple(trip[:2]) for key, trip in (trips.items() if isinstance(trips, dict) else enumerate(trips))}
+        validate_trips(approval, arrival, self.trips.values())
+        self.rule_set = rule_set
+        self.today = today or date.today()
+        self.application = rule_set.application_date(approval)
+
+        # 每個規則需要的窗口（日數），時間軸只需涵蓋這些窗口
+        self.windows = []
+        for rule in rule_set.rules:
+            if rule.anchor == ANCHOR_ROLLING:
+                first = (approval + rule.start).toordinal()
+                stop = (approval + rule.until).toordinal()
+                self.windows.append((rule, first, stop + rule.window_days - 1))
+            else:
+                end = (self.application if rule.anchor == ANCHOR_APPLICATION else self.today) - timedelta(days=1)
+                self.windows.append((rule, rule.window_start(end).toordinal(), end.toordinal() + 1))
+        self.base = min([approval.toordinal()] + [first for _, first, _ in self.windows])
+        self.limit = max(stop for _, _, stop in self.windows)
+
+        self.coverage = None
+        if travel_numpy.available:
+            np = travel_numpy.load_numpy()
+            diff = np.zeros(self.limit - self.base + 1, dtype=np.int32)
+            for start, end in [(approval.toordinal(), arrival.toordinal())] + [self._span(*t) for t in self.trips.values()]:
+                self._mark(diff, start, end, 1)
+            self.coverage = np.cumsum(diff[:-1])
+
+    def _span(self, start, end):
+        # 出國時段的離境日子（日數）：出國日翌日至回國日前一日
+        return start.toordinal() + 1, end.toordinal()
+
+    def _mark(self, diff, start, end, delta):
+        lo = min(max(start - self.base, 0), self.limit - self.base)
+        hi = min(max(end - self.base, 0), self.limit - self.base)
+        if lo < hi:
+            diff[lo] += delta
+            diff[hi] -= delta
+
+    def _changes(self, scenario):
+        # 回傳 (移除的行程, 新增的行程)
+        for key in list(scenario.remove) + list(scenario.shift):
+            if key not in self.trips:
+                raise TravelDataError(f"{scenario.name}：沒有此行程：{key}")
+        removed = [self.trips[key] for key in set(scenario.remove) | set(scenario.shift)]
+        added = list(scenario.add)
+        for key, days in scenario.shift.items():
+            if key not in scenario.remove:
+                start, end = self.trips[key]
+                added.append((start + timedelta(days=days), end + timedelta(days=days)))
+        validate_trips(self.approval, self.arrival, added)
+        return removed, added
+
+    def evaluate(self, scenarios, periods=False):
+        # periods=True 時同時列出 rolling 規則離境日數達 report 的窗口（方案多時較慢）
+        if self.coverage is None:
+            return [self._evaluate_one(scenario, periods) for scenario in scenarios]
+        return self._evaluate_numpy(scenarios, periods)
+
+    def _evaluate_one(self, scenario, periods):
+        # 沒有 numpy 時逐個情境以 AbsenceIndex 計算
+        removed, added = self._changes(scenario)
+        trips = list(self.trips.values())
+        for trip in removed:
+            trips.remove(trip)
+        index = AbsenceIndex(stay_intervals(self.approval, self.arrival, trips + added))
+        result = travel_rules.evaluate(index, self.approval, [self.rule_set], self.today)[0]
+        if not periods:
+            for rule_result in result.results.values():
+                rule_result.periods = []
+        return ScenarioResult(scenario, result)
+
+    def _evaluate_numpy(self, scenarios, periods):
+        np = travel_numpy.load_numpy()
+        size = self.limit - self.base
+        diff = np.zeros((len(scenarios), size + 1), dtype=np.int32)
+        for row, scenario in enumerate(scenarios):
+            removed, added = self._changes(scenario)
+            for trip in removed:
+                self._mark(diff[row], *self._span(*trip), -1)
+            for trip in added:
+                self._mark(diff[row], *self._span(*trip), 1)
+
+        absent = (self.coverage + np.cumsum(diff[:, :-1], axis=1)) > 0
+        prefix = np.zeros((len(scenarios), size + 1), dtype=np.int32)
+        np.cumsum(absent, axis=1, out=prefix[:, 1:])
+
+        columns = []
+        for rule, first, stop in self.windows:
+            lo, hi = first - self.base, stop - self.base
+            if rule.anchor == ANCHOR_ROLLING:
+                window = rule.window_days
+                totals = prefix[:, lo + window:hi + 1] - prefix[:, lo:hi + 1 - window]
+                columns.append((rule, first, stop, totals))
+            else:
+                columns.append((rule, first, stop, prefix[:, hi] - prefix[:, lo]))
+
+        results = []
+        for row, scenario in enumerate(scenarios):
+            rule_set_result = RuleSetResult(self.rule_set, self.application)
+            for rule, first, stop, values in columns:
+                if rule.anchor == ANCHOR_ROLLING:
+                    totals = values[row]
+                    if not len(totals):
+                        result = RuleResult(rule, 0, None, None)
+                    else:
+                        offset = int(totals.argmax())
+                        start = date.fromordinal(first + offset)
+                        result = RuleResult(rule, int(totals[offset]), start,
+                                            start + timedelta(days=rule.window_days - 1))
+                        if periods and rule.report is not None:
+                            offsets = np.flatnonzero(totals >= rule.report)
+                            result.periods = sorted(
+                                ((int(totals[o]), date.fromordinal(first + int(o)),
+                                  date.fromordinal(first + int(o) + rule.window_days - 1)) for o in offsets),
+                                key=lambda p: p[0], reverse=True)
+                else:
+                    result = RuleResult(rule, int(values[row]), date.fromordinal(first), date.fromordinal(stop - 1))
+                rule_set_result.results[rule.id] = result
+            results.append(ScenarioResult(scenario, rule_set_result))
+        return results
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m travel_scenarios", description="以同一份出入境記錄一次過計算多個假設行程方案")
+    parser.add_argument("file", help="bno_travel_data.csv 格式的檔案")
+    parser.add_argument("scenarios", help="方案 JSON 檔案（行程編號按檔案中次序，由 0 起）")
+    parser.add_argument("--today", help="以指定日期 (yyyy-mm-dd) 代替今日")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    today = None
+    if args.today:
+        today = parse_date(args.today)
+        if not today:
+            print(f"日期格式錯誤：{args.today}", file=sys.stderr)
+            return 2
+
+    try:
+        with open(args.scenarios, encoding="utf-8") as f:
+            scenarios = [Scenario.from_dict(data, i) for i, data in enumerate(json.load(f))]
+    except (OSError, ValueError) as e:
+        print(f"{args.scenarios}: {e}", file=sys.stderr)
+        return 1
+
+    try:
+        record = read_record(args.file)
+        batch = ScenarioBatch(record.approval, record.arrival, record.trips, today=today)
+        results = batch.evaluate(scenarios)
+    except (OSError, TravelDataError) as e:
+        print(f"{args.file}: {e}", file=sys.stderr)
+        return 1
+
+    json.dump([result.to_dict() for result in results], sys.stdout, ensure_ascii=False, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
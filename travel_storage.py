@@ -0,0 +1,307 @@
+import csv
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date
+
+from travel_dates import parse_date
+
+# sqlite3、tempfile 及 uuid 在第一次使用時才 import，視窗程式啟動時不需載入
+
+
+@dataclass
+class StoredData:
+    # 與畫面相同的文字形式；rows 為 (key, 出國日, 回國日, 活動)
+    # positions 為各行的排列位置（與 rows 對應，可以有空隙）；空白時按 rows 的次序
+    approval: str = ""
+    arrival: str = ""
+    saved_at: str = ""
+    rows: list = field(default_factory=list)
+    positions: list = field(default_factory=list)
+
+
+def new_row_key():
+    import uuid
+    return uuid.uuid4().hex[:12]
+
+
+def _encode(text):
+    # 日期以日數 (date.toordinal) 儲存；未能解析的文字原樣保留，避免遺失未完成的輸入
+    text = (text or "").strip()
+    parsed = parse_date(text)
+    if parsed:
+        return parsed.toordinal(), None
+    return None, text or None
+
+
+def _decode(day, text):
+    if day is not None:
+        return date.fromordinal(day).isoformat()
+    return text or ""
+
+
+class CsvStore:
+    # bno_travel_data.csv：第一行為批核日、到達日、儲存日期，之後每行為出國日、回國日、活動
+    autosave = False
+    multi_profile = False
+
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self, profile=None):
+        if not self.exists():
+            return None
+        with open(self.path, newline='', encoding="utf-8") as f:
+            data = list(csv.reader(f))
+        if not data:
+            return None
+        header = list(data[0]) + ["", "", ""]
+        rows = []
+        for line in data[1:]:
+            out_date, in_date, activity = (list(line) + ["", "", ""])[:3]
+            rows.append((new_row_key(), out_date, in_date, activity))
+        return StoredData(header[0], header[1], header[2], rows)
+
+    def save(self, data, profile=None):
+        rows_data = [[data.approval, data.arrival, data.saved_at]]
+        rows_data += [[out_date, in_date, activity] for _, out_date, in_date, activity in data.rows
+                      if out_date or in_date]
+        # 先寫入同一資料夾的暫存檔，再以 os.replace 取代，避免寫到一半時留下損壞的檔案
+        import tempfile
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".bno_", suffix=".csv", dir=directory)
+        try:
+            with os.fdopen(fd, "w", newline='', encoding="utf-8") as f:
+                csv.writer(f).writerows(rows_data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def close(self):
+        pass
+
+
+class SqliteStore:
+    # 每個 profile 一組批核日／到達日及行程；修改單一行時只更新該行
+    # 行程由建立它的 profile 擁有，其他同行的 profile 經 trip_member 引用同一行
+    autosave = True
+    multi_profile = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS profile (
+            id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL,
+            approval_day INTEGER, approval_text TEXT,
+            arrival_day INTEGER, arrival_text TEXT,
+            saved_at TEXT NOT NULL DEFAULT ''
+        );
+        CREATE TABLE IF NOT EXISTS trip (
+            profile_id INTEGER NOT NULL REFERENCES profile(id),
+            row_key TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            out_day INTEGER, out_text TEXT,
+            in_day INTEGER, in_text TEXT,
+            activity TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (profile_id, row_key)
+        );
+        CREATE TABLE IF NOT EXISTS trip_member (
+            profile_id INTEGER NOT NULL REFERENCES profile(id),
+            row_key TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (profile_id, row_key)
+        );
+        CREATE INDEX IF NOT EXISTS trip_row_key ON trip (row_key);
+        -- 舊版本寫入的 journal 從未被讀取，已不再使用
+        DROP TABLE IF EXISTS journal;
+    """
+
+    def __init__(self, path, profile="default"):
+        import sqlite3
+        self.path = path
+        # 所有寫入都經由同一個背景工作執行緒進行
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self.profile = profile
+
+    def _profile_id(self, name=None, create=True):
+        name = name or self.profile
+        row = self.conn.execute("SELECT id FROM profile WHERE name = ?", (name,)).fetchone()
+        if row:
+            return row[0]
+        if not create:
+            return None
+        return self.conn.execute("INSERT INTO profile (name) VALUES (?)", (name,)).lastrowid
+
+    def profiles(self):
+        return [name for (name,) in self.conn.execute("SELECT name FROM profile ORDER BY id")]
+
+    def add_profile(self, name):
+        with self.transaction():
+            self._profile_id(name)
+
+    def exists(self):
+        return self._profile_id(create=False) is not None
+
+    def load(self, profile=None):
+        profile_id = self._profile_id(profile, create=False)
+        if profile_id is None:
+            return None
+        approval_day, approval_text, arrival_day, arrival_text, saved_at = self.conn.execute(
+            "SELECT approval_day, approval_text, arrival_day, arrival_text, saved_at FROM profile WHERE id = ?",
+            (profile_id,)).fetchone()
+        # 位置只用作排序，刪除行後留下的空隙不需重新編號
+        data = StoredData(_decode(approval_day, approval_text), _decode(arrival_day, arrival_text), saved_at)
+        for key, out_day, out_text, in_day, in_text, activity, position in self.conn.execute(
+                    "SELECT row_key, out_day, out_text, in_day, in_text, activity, position FROM trip "
+                    "WHERE profile_id = ? "
+                    "UNION ALL "
+                    "SELECT t.row_key, t.out_day, t.out_text, t.in_day, t.in_text, t.activity, m.position "
+                    "FROM trip_member m JOIN trip t ON t.row_key = m.row_key WHERE m.profile_id = ? "
+                    "ORDER BY 7, 1", (profile_id, profile_id)):
+            data.rows.append((key, _decode(out_day, out_text), _decode(in_day, in_text), activity))
+            data.positions.append(position)
+        return data
+
+    def save(self, data, profile=None):
+        # 整份取代（例如由 CSV 匯入），在同一個交易內完成
+        with self.transaction():
+            profile_id = self._profile_id(profile)
+            self._write_stay(profile_id, data.approval, data.arrival, data.saved_at)
+            keep = {row[0] for row in data.rows}
+            current = [key for (key,) in self.conn.execute(
+                "SELECT row_key FROM trip WHERE profile_id = ? UNION SELECT row_key FROM trip_member WHERE profile_id = ?",
+                (profile_id, profile_id))]
+            for key in current:
+                if key not in keep:
+                    self._delete_row(profile_id, key)
+            positions = data.positions or range(len(data.rows))
+            for position, (key, out_date, in_date, activity) in zip(positions, data.rows):
+                self._write_row(profile_id, key, position, out_date, in_date, activity)
+
+    def set_stay(self, approval, arrival, saved_at=None, profile=None):
+        with self.transaction():
+            self._write_stay(self._profile_id(profile), approval, arrival, saved_at)
+
+    def upsert_row(self, key, position, out_date, in_date, activity, profile=None):
+        with self.transaction():
+            self._write_row(self._profile_id(profile), key, position, out_date, in_date, activity)
+
+    def delete_rows(self, keys, profile=None):
+        # 餘下各行的位置不變，所以每刪除一行只需更新該行
+        with self.transaction():
+            profile_id = self._profile_id(profile)
+            for key in keys:
+                self._delete_row(profile_id, key)
+
+    def share_rows(self, keys, profiles):
+        # 把行程加入其他 profile（引用同一行，之後任何一方修改都會反映到所有人）
+        with self.transaction():
+            for name in profiles:
+                profile_id = self._profile_id(name)
+                (position,) = self.conn.execute(
+                    "SELECT COALESCE(MAX(position), -1) + 1 FROM ("
+                    "SELECT position FROM trip WHERE profile_id = ? "
+                    "UNION ALL SELECT position FROM trip_member WHERE profile_id = ?)",
+                    (profile_id, profile_id)).fetchone()
+                for key in keys:
+                    owner = self._owner(key)
+                    if owner is None or owner == profile_id:
+                        continue
+                    inserted = self.conn.execute(
+                        "INSERT OR IGNORE INTO trip_member (profile_id, row_key, position) VALUES (?, ?, ?)",
+                        (profile_id, key, position)).rowcount
+                    if inserted:
+                        position += 1
+
+    def _write_stay(self, profile_id, approval, arrival, saved_at):
+        approval_day, approval_text = _encode(approval)
+        arrival_day, arrival_text = _encode(arrival)
+        self.conn.execute(
+            "UPDATE profile SET approval_day = ?, approval_text = ?, arrival_day = ?, arrival_text = ?, "
+            "saved_at = COALESCE(?, saved_at) WHERE id = ?",
+            (approval_day, approval_text, arrival_day, arrival_text, saved_at, profile_id))
+
+    def _owner(self, key):
+        row = self.conn.execute("SELECT profile_id FROM trip WHERE row_key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _delete_row(self, profile_id, key):
+        # 只從此 profile 移除；擁有者刪除仍有人同行的行程時，轉交給第一個同行的 profile
+        if self._owner(key) != profile_id:
+            self.conn.execute("DELETE FROM trip_member WHERE profile_id = ? AND row_key = ?", (profile_id, key))
+            return
+        member = self.conn.execute(
+            "SELECT profile_id, position FROM trip_member WHERE row_key = ? ORDER BY profile_id LIMIT 1",
+            (key,)).fetchone()
+        if member is None:
+            self.conn.execute("DELETE FROM trip WHERE row_key = ?", (key,))
+            return
+        self.conn.execute("UPDATE trip SET profile_id = ?, position = ? WHERE row_key = ?", (*member, key))
+        self.conn.execute("DELETE FROM trip_member WHERE profile_id = ? AND row_key = ?", (member[0], key))
+
+    def _write_row(self, profile_id, key, position, out_date, in_date, activity):
+        out_day, out_text = _encode(out_date)
+        in_day, in_text = _encode(in_date)
+        owner = self._owner(key)
+        if owner is not None and owner != profile_id:
+            # 同行的行程：修改擁有者的一行，只在此 profile 記錄位置
+            self.conn.execute(
+                "UPDATE trip SET out_day = ?, out_text = ?, in_day = ?, in_text = ?, activity = ? WHERE row_key = ?",
+                (out_day, out_text, in_day, in_text, (activity or "").strip(), key))
+            self.conn.execute(
+                "INSERT INTO trip_member (profile_id, row_key, position) VALUES (?, ?, ?) "
+                "ON CONFLICT (profile_id, row_key) DO UPDATE SET position = excluded.position",
+                (profile_id, key, position))
+            return
+        self.conn.execute(
+            "INSERT INTO trip (profile_id, row_key, position, out_day, out_text, in_day, in_text, activity) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (profile_id, row_key) DO UPDATE SET position = excluded.position, "
+            "out_day = excluded.out_day, out_text = excluded.out_text, in_day = excluded.in_day, "
+            "in_text = excluded.in_text, activity = excluded.activity",
+            (profile_id, key, position, out_day, out_text, in_day, in_text, (activity or "").strip()))
+
+    @contextmanager
+    def transaction(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def import_csv(self, path, profile=None):
+        data = CsvStore(path).load()
+        if data is not None:
+            self.save(data, profile)
+        return data
+
+    def export_csv(self, path, profile=None):
+        data = self.load(profile)
+        if data is not None:
+            CsvStore(path).save(data)
+        return data
+
+    def close(self):
+        self.conn.close()
+
+
+def open_store(csv_path, db_path, backend=None):
+    # backend 為 "csv" 或 "sqlite"；未指定時如已有資料庫則使用 SQLite，否則沿用 CSV
+    backend = backend or os.environ.get("BNO_STORAGE") or ("sqlite" if os.path.exists(db_path) else "csv")
+    if backend != "sqlite":
+        return CsvStore(csv_path)
+    store = SqliteStore(db_path)
+    if not store.exists() and os.path.exists(csv_path):
+        store.import_csv(csv_path)
+    return store
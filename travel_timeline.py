@@ -0,0 +1,120 @@
+import argparse
+import csv
+import sys
+from datetime import timedelta
+
+from travel_calc import (LIMIT_365, LIMIT_ILR_PERIOD, RULE_ILR_PERIOD, WINDOW_365, TravelDataError, parse_date,
+                         read_record, rule_periods, validate_trips)
+from travel_engine import AbsenceIndex, stay_intervals
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+parquet_available = pa is not None
+
+TIMELINE_FIELDS = ["date", "absent", "rolling_365", "remain_365", "rolling_5y", "remain_5y"]
+# Parquet 每批寫出的行數；記憶體用量只與此數目有關，與時間軸長短無關
+BATCH_ROWS = 8192
+
+
+def iter_timeline(approval, arrival, trips, horizon=None):
+    # 由批核日至 horizon（包括當日，預設為入籍計算期結束日）逐日產生：
+    # (日期, 當日是否離境, 截至當日365日內離境日數, 剩餘, 截至當日5年內離境日數, 剩餘)
+    # 窗口不早於批核日；在入籍計算期結束日，5年內離境日數與入籍計算期的結果相同
+    validate_trips(approval, arrival, trips)
+    index = AbsenceIndex(stay_intervals(approval, arrival, trips))
+    horizon = horizon or rule_periods(approval)[3]
+    first = approval.toordinal()
+
+    day = approval
+    previous = index.days_before(first)
+    while day <= horizon:
+        ordinal = day.toordinal()
+        before = index.days_before(ordinal + 1)
+        rolling_365 = before - index.days_before(max(first, ordinal - WINDOW_365 + 1))
+        five_years_start = max(first, RULE_ILR_PERIOD.window_start(day).toordinal())
+        rolling_5y = before - index.days_before(five_years_start)
+        yield day, before - previous, rolling_365, LIMIT_365 - rolling_365, rolling_5y, LIMIT_ILR_PERIOD - rolling_5y
+        previous = before
+        day += timedelta(days=1)
+
+
+def write_csv(rows, out):
+    # 逐行寫出，回傳行數
+    writer = csv.writer(out)
+    writer.writerow(TIMELINE_FIELDS)
+    count = 0
+    for day, *values in rows:
+        writer.writerow([day.isoformat(), *values])
+        count += 1
+    return count
+
+
+def write_parquet(rows, path, batch_rows=BATCH_ROWS):
+    # 需要 pyarrow；每 batch_rows 行寫出一個 row group，回傳行數
+    if not parquet_available:
+        raise RuntimeError("輸出 Parquet 需要安裝 pyarrow。")
+    schema = pa.schema([("date", pa.date32())] + [(name, pa.int32()) for name in TIMELINE_FIELDS[1:]])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        columns = [[] for _ in TIMELINE_FIELDS]
+        for row in rows:
+            for column, value in zip(columns, row):
+                column.append(value)
+            count += 1
+            if len(columns[0]) >= batch_rows:
+                writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+                columns = [[] for _ in TIMELINE_FIELDS]
+        if columns[0]:
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+    return count
+
+
+def export_timeline(approval, arrival, trips, path, horizon=None, fmt=None):
+    # fmt 為 "csv" 或 "parquet"；未指定時按副檔名決定
+    fmt = fmt or ("parquet" if str(path).lower().endswith(".parquet") else "csv")
+    rows = iter_timeline(approval, arrival, trips, horizon)
+    if fmt == "parquet":
+        return write_parquet(rows, path)
+    with open(path, "w", newline='', encoding="utf-8") as f:
+        return write_csv(rows, f)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m travel_timeline", description="逐日輸出離境狀態及滾動離境日數")
+    parser.add_argument("file", help="bno_travel_data.csv 格式的檔案")
+    parser.add_argument("-o", "--output", help="輸出檔案，.csv 或 .parquet（預設以 CSV 輸出至 stdout）")
+    parser.add_argument("--horizon", help="輸出至此日期 (yyyy-mm-dd)，預設為入籍計算期結束日")
+    parser.add_argument("--format", choices=("csv", "parquet"), help="輸出格式（預設按副檔名決定）")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    horizon = None
+    if args.horizon:
+        horizon = parse_date(args.horizon)
+        if not horizon:
+            print(f"日期格式錯誤：{args.horizon}", file=sys.stderr)
+            return 2
+
+    try:
+        record = read_record(args.file)
+        if args.output:
+            export_timeline(record.approval, record.arrival, record.trips, args.output, horizon, args.format)
+        elif args.format == "parquet":
+            print("輸出 Parquet 時必須指定 -o。", file=sys.stderr)
+            return 2
+        else:
+            write_csv(iter_timeline(record.approval, record.arrival, record.trips, horizon), sys.stdout)
+    except (OSError, RuntimeError, TravelDataError) as e:
+        print(f"{args.file}: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())